@@ -15,6 +15,32 @@ DELTA = SIGMA = 0.01
 # algorithm parameters
 get_p_m = lambda l: 0.1 / l / N
 get_pop_seed = lambda run_i: 1381*run_i + 5912826
+# number of random values a run draws from its generator at once (see model/random_source.py)
+RANDOM_BLOCK_SIZE = 16384
+# number of runs of an experiment evolved together in lockstep (see lockstep_algorithm.py),
+# 1 to evolve every run separately. A run draws the same random numbers in a lockstep group as on
+# its own, except for the runs with mutation that the single-run engine fast-forwards through
+# stationary generations, whose results can change
+LOCKSTEP_RUNS = 1
+# keep the populations of the runs without genetic operators as multisets of genotypes
+# (see model/genotype_multiset.py), the runs that are plotted always keep all chromosomes.
+# The copies of a genotype lie next to each other on the wheel, so SUS gives a genotype the floor
+# or ceil of its expected number of copies, while on a population with the copies spread over it
+# the number can vary more: the results of SUS without genetic operators change
+GENOTYPE_MULTISETS = False
+# solve the FconstALL, FH and FHD experiments without genetic operators exactly from a Markov chain
+# (see runner.solve_experiment) instead of running them; for FH and FHD the chain takes all
+# non-optimal chromosomes to have their mean initial fitness
+ANALYTIC_EXPERIMENTS = False
+
+# stats parameters
+# names of the generation stats to compute (see stats/metrics.py), None for all of them;
+# the runs that are plotted always compute all of them
+GEN_STATS_METRICS = None
+
+# fitness cache parameters
+FITNESS_TABLE_MAX_LENGTH = 20
+FITNESS_CACHE_SIZE = 100000
 
 # output parameters
 DISTRIBUTIONS_TO_PLOT = 3
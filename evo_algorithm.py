@@ -1,10 +1,14 @@
 from config import *
 from model.fitness_functions import *
 from selection.selection_method import SelectionMethod
-from model.gen_operators import GeneticOperator
-from stats.run_stats import RunStats
+from model.gen_operators import GeneticOperator, BlankGenOperator
+from model.genotype_multiset import GenotypeMultiset
+from model.random_source import RandomSource
+from stats.run_stats import RunStats, check_success
 from stats.generation_stats import GenerationStats
+from stats import metrics
 from output import plotting, excel
+import numpy as np
 
 
 class EvoAlgorithm:
@@ -21,21 +25,34 @@ class EvoAlgorithm:
         self.param_names = param_names
 
         self.gen_i = 0
-        self.run_stats = RunStats(self.param_names)
+        self.metrics = metrics.resolve(metrics.required_names(self.param_names), self.param_names)
+        self.run_stats = RunStats(self.param_names, [metric.name for metric in self.metrics])
         self.prev_gen_stats = None
         self.gen_stats_list = None
         self.has_converged = False
         self.plot_thresholds = None
+        self.rng = None
+        # number of the last generations that left the population as it is
+        self.stationary_gens = 0
+        # whether the next generation applies the genetic operator's next event, see __fast_forward
+        self.event_pending = False
         
     def run(self, run_i):
+        self.rng = RandomSource(run_i)
         if run_i < RUNS_TO_PLOT:
+            # the plots and generation tables need all the stats
+            self.metrics = metrics.resolve(None, self.param_names)
             self.gen_stats_list = []
             self.plot_thresholds = {}
             for key in [70, 80, 90, 95, 99]:
                 self.plot_thresholds[str(key)] = False
+        elif GENOTYPE_MULTISETS and issubclass(self.genetic_operator, BlankGenOperator):
+            # selection alone only changes the number of copies of every genotype
+            self.population = GenotypeMultiset(self.population)
 
         f_avgs = []
         while not self.has_converged and self.gen_i < G:
+            fingerprints = self.population.fingerprints.copy()
             gen_stats = self.__calculate_stats_and_evolve(run_i)
 
             f_avgs.append(gen_stats.f_avg)
@@ -46,10 +63,14 @@ class EvoAlgorithm:
             self.prev_gen_stats = gen_stats
             self.gen_i += 1
 
+            if run_i >= RUNS_TO_PLOT and not self.has_converged:
+                self.__fast_forward(gen_stats, fingerprints)
+
         gen_stats = self.__calculate_final_stats(run_i)
         self.run_stats.NI = self.gen_i
         self.run_stats.has_converged = self.has_converged
-        self.run_stats.is_successful = self.__check_success(gen_stats)
+        self.run_stats.is_successful = bool(check_success(self.param_names, self.population, self.has_converged,
+                                                          gen_stats.optimal_count))
 
         if run_i < RUNS_TO_PLOT:
             # print(f'Generation stats list = {self.gen_stats_list}')
@@ -75,18 +96,52 @@ class EvoAlgorithm:
                     excel.write_population_stats(self.population, self.param_names, run_i, 
                                                  self.gen_i, key/100.)
 
-        gen_stats = GenerationStats(self.population, self.param_names, self.selection_method)
+        gen_stats = GenerationStats(self.population, self.param_names, self.selection_method, self.metrics)
         if run_i < RUNS_TO_PLOT:
             self.gen_stats_list.append(gen_stats)
 
         gen_stats.calculate_stats_before_selection(self.prev_gen_stats)
-        self.selection_method.select(self.population)
+        self.selection_method.select(self.population, self.rng)
         gen_stats.calculate_stats_after_selection()
         self.run_stats.update_stats_for_generation(gen_stats, self.gen_i)
-        self.genetic_operator.apply(self.population)
+        if self.event_pending:
+            self.genetic_operator.apply_event(self.population, self.rng)
+            self.event_pending = False
+        else:
+            self.genetic_operator.apply(self.population, self.rng)
 
         return gen_stats
 
+    def __fast_forward(self, gen_stats: GenerationStats, fingerprints):
+        """
+        Skip the generations in which the population stays the same: selection leaves it as it is,
+        and the genetic operator does not change it until its next event. Every skipped generation
+        has the stats of the last one, which are added to the run stats in closed form
+        :param fingerprints: fingerprints of the population before the last generation
+        """
+        if np.array_equal(fingerprints, self.population.fingerprints) \
+                and self.selection_method.is_identity(self.population):
+            self.stationary_gens += 1
+        else:
+            self.stationary_gens = 0
+
+        # the stats of a generation depend on the previous generation,
+        # so they only repeat after two generations without changes
+        if self.stationary_gens < 2:
+            return
+        quiet_generations = self.genetic_operator.sample_quiet_generations(self.population, self.rng)
+        if quiet_generations is None:
+            return
+
+        generations = int(min(quiet_generations, G - self.gen_i))
+        if generations > 0:
+            self.run_stats.update_stats_for_generation(gen_stats, self.gen_i, generations)
+            self.selection_method.skip(generations)
+            self.gen_i += generations
+        # the generation after the quiet ones changes the population, unless the generation limit comes first
+        self.event_pending = generations == quiet_generations
+        self.stationary_gens = 0
+
     def __calculate_final_stats(self, run_i):
         if run_i < RUNS_TO_PLOT and (self.gen_i < DISTRIBUTIONS_TO_PLOT or self.gen_i % DISTRIBUTION_RATE_TO_PLOT == 0):
             plotting.plot_generation_stats(self.population, self.param_names, run_i, self.gen_i)
@@ -104,7 +159,7 @@ class EvoAlgorithm:
                     excel.write_population_stats(self.population, self.param_names, run_i, 
                                                  self.gen_i, key/100.)
 
-        gen_stats = GenerationStats(self.population, self.param_names, self.selection_method)
+        gen_stats = GenerationStats(self.population, self.param_names, self.selection_method, self.metrics)
         if run_i < RUNS_TO_PLOT:
             self.gen_stats_list.append(gen_stats)
 
@@ -112,16 +167,3 @@ class EvoAlgorithm:
         self.run_stats.update_final_stats(gen_stats, self.gen_i)
 
         return gen_stats
-
-
-    def __check_success(self, gen_stats: GenerationStats):
-        if self.param_names[0] == 'FconstALL':
-            if self.param_names[2] == 'no_operators':
-                return self.population.is_homogenous_100()
-            return self.has_converged and self.population.is_homogeneous_frac(90)
-        if self.param_names[0] == 'FHD' or self.param_names[0] == 'FH':
-            if self.param_names[2] == 'no_operators':
-                return self.has_converged and gen_stats.optimal_count == N
-            return self.has_converged and gen_stats.optimal_count >= N * 0.9
-        else:
-            return self.has_converged and self.population.found_close_to_optimal()
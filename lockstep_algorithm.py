@@ -0,0 +1,133 @@
+from config import *
+from model.population import Population
+from model.population_batch import PopulationBatch
+from selection.selection_method import SelectionMethod
+from selection.rws import RWS, DisruptiveRWS
+from selection.sus import SUS, DisruptiveSUS
+from model.gen_operators import GeneticOperator, BlankGenOperator
+from model.random_source import RandomSource
+from stats.run_stats import RunStatsBatch, check_success
+from stats.generation_stats import GenerationStatsBatch
+from stats import metrics
+import numpy as np
+
+# selection methods whose mating pool only depends on the current fitnesses, so they can choose
+# the mating pools of all populations of a batch at once
+BATCH_SELECTION_METHODS = (RWS, DisruptiveRWS, SUS, DisruptiveSUS)
+
+
+class LockstepAlgorithm:
+    """
+    Evolves several runs of an experiment together: their populations form one PopulationBatch,
+    every generation is one step for all of them, and the runs that have converged are removed
+    from the batch. Every run has its own RandomSource, so its result does not depend on
+    the other runs of the batch. The runs are not plotted, see EvoAlgorithm for the plotted ones
+    """
+    def __init__(self,
+                 initial_populations: list[Population],
+                 selection_method: SelectionMethod,
+                 genetic_operator: GeneticOperator,
+                 population_init,
+                 param_names: tuple[str],
+                 run_indices: list[int]):
+        self.population = PopulationBatch(initial_populations)
+        self.selection_method = selection_method
+        self.genetic_operator = genetic_operator
+
+        self.param_names = param_names
+        self.run_indices = list(run_indices)
+
+        self.gen_i = 0
+        self.metrics = metrics.resolve(metrics.required_names(self.param_names), self.param_names)
+        self.run_stats = RunStatsBatch(self.param_names, [metric.name for metric in self.metrics],
+                                       len(self.run_indices))
+        # positions in run_indices of the runs left in the batch
+        self.runs = np.arange(len(self.run_indices))
+        self.rngs = [RandomSource(run_i) for run_i in self.run_indices]
+        self.has_converged = np.zeros(len(self.run_indices), dtype=bool)
+        # number of the last generations that left the population of a run as it is
+        self.stationary_gens = np.zeros(len(self.run_indices), dtype=np.int64)
+
+    @staticmethod
+    def supports(selection_method: SelectionMethod, genetic_operator: GeneticOperator):
+        return type(selection_method) in BATCH_SELECTION_METHODS \
+            and genetic_operator.apply_batch is not GeneticOperator.apply_batch
+
+    def run(self):
+        """
+        :return: list of (run index, RunStats) of all runs
+        """
+        prev_gen_stats = None
+        finished = np.zeros(len(self.runs), dtype=bool)
+        stalled = np.zeros(len(self.runs), dtype=bool)
+        while True:
+            gen_stats = GenerationStatsBatch(self.population, self.param_names, self.selection_method, self.metrics)
+            gen_stats.calculate_stats_before_selection(prev_gen_stats)
+
+            if np.any(finished):
+                # the stats of this generation are the final stats of the finished runs,
+                # the stalled runs are finished at the generation limit
+                is_successful = check_success(self.param_names, self.population, self.has_converged[self.runs],
+                                              gen_stats.optimal_count)
+                self.__finish(gen_stats.take(finished & ~stalled), finished & ~stalled, self.gen_i, is_successful)
+                self.__finish(gen_stats.take(stalled), stalled, G, is_successful)
+                left = ~finished
+                self.population.keep(left)
+                gen_stats = gen_stats.take(left)
+                self.runs = self.runs[left]
+                self.rngs = [rng for rng, is_left in zip(self.rngs, left) if is_left]
+                if len(self.runs) == 0:
+                    break
+
+            fingerprints = self.population.fingerprints.copy()
+            indices = self.selection_method.choose_batch(self.population.fitnesses, self.rngs)
+            self.population.select(indices)
+            gen_stats.calculate_stats_after_selection()
+            self.run_stats.update_stats_for_generation(gen_stats, self.gen_i, self.runs)
+            self.genetic_operator.apply_batch(self.population, self.rngs)
+
+            has_converged = self.population.has_converged(self.param_names)
+            self.has_converged[self.runs] = has_converged
+            prev_gen_stats = gen_stats
+            self.gen_i += 1
+            stalled = self.__stall(gen_stats, fingerprints, has_converged)
+            finished = has_converged | stalled | (self.gen_i >= G)
+
+        return list(zip(self.run_indices, self.run_stats.split()))
+
+    def __stall(self, gen_stats: GenerationStatsBatch, fingerprints, has_converged):
+        """
+        Find the runs that stay the same until the generation limit: selection leaves their populations
+        as they are and there is no genetic operator. The remaining generations have the stats of the last one,
+        which are added to the run stats in closed form
+        :param fingerprints: fingerprints of the populations before the last generation
+        :return: mask of the stalled runs in the batch
+        """
+        unchanged = np.all(fingerprints == self.population.fingerprints, axis=1) \
+            & self.selection_method.is_identity_batch(self.population.fitnesses)
+        self.stationary_gens[self.runs] = np.where(unchanged, self.stationary_gens[self.runs] + 1, 0)
+        if not issubclass(self.genetic_operator, BlankGenOperator) or self.gen_i >= G:
+            return np.zeros(len(self.runs), dtype=bool)
+
+        # the stats of a generation depend on the previous generation,
+        # so they only repeat after two generations without changes
+        stalled = (self.stationary_gens[self.runs] >= 2) & ~has_converged
+        if np.any(stalled):
+            self.run_stats.update_stats_for_generation(gen_stats.take(stalled), self.gen_i, self.runs[stalled],
+                                                       G - self.gen_i)
+        return stalled
+
+    def __finish(self, gen_stats: GenerationStatsBatch, finished, gen_i, is_successful):
+        """
+        :param gen_stats: final stats of the finished runs
+        :param finished: mask of the finished runs in the batch
+        :param gen_i: generation the runs finished at
+        :param is_successful: whether every run of the batch is successful
+        """
+        runs = self.runs[finished]
+        if len(runs) == 0:
+            return
+        self.run_stats.update_final_stats(gen_stats, gen_i, runs)
+        self.run_stats.NI[runs] = gen_i
+        self.run_stats.has_converged[runs] = self.has_converged[runs]
+        self.run_stats.is_successful[runs] = is_successful[finished]
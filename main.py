@@ -1,11 +1,13 @@
-from config import env, NR
+from config import env, THREADS
 from model.fitness_functions import *
 from selection.rws import *
 from selection.sus import *
 from model.encoding import *
 from model.gen_operators import *
 from output import excel
-from runner import run_experiment
+from runner import run_experiments
+from model.population_store import PopulationStore
+from multiprocess import Pool
 from datetime import datetime
 import time
 
@@ -93,10 +95,6 @@ experiment_params = {
     ] for (ff, ff_name) in fitness_functions
 }
 
-# only keeping one list of populations in memory at a time (for one fitness function)
-def generate_all_populations_for_fitness_function(ff, n_optimal=1):
-    return [ff.generate_population_for_run(run_i, n_optimal=n_optimal) for run_i in range(NR)]
-
 def log(x):
     datetime_prefix = str(datetime.now())[:-4]
     print(f'{datetime_prefix} | {x}')
@@ -118,41 +116,49 @@ if __name__ == '__main__':
     log('Program start')
     print('----------------------------------------------------------------------')
     start_time = time.time()
-    results = []
 
+    # the experiments of all fitness functions are run from a single queue of runs
+    experiments = []
     for ff in experiment_params:
-        ff_start_time = time.time()
         # get experiment parameters for a given running configuration
         exp_params = experiment_params[ff]
 
-        # generate populations for each each initialization configuration
-        populations = {
-            pi: generate_all_populations_for_fitness_function(ff, n_optimal=pi)
-            for (pi, name) in population_inits
-        }
+        # generate populations for each each initialization configuration into shared memory,
+        # the runs only receive references to them
+        store = PopulationStore(ff, [pi for (pi, name) in population_inits])
+        populations = {pi: store.runs(pi) for (pi, name) in population_inits}
 
         # filter out the configurations that are not required
         exp_params = [param for param in exp_params if validate_params(ff, *param)]
 
         # add respective populations to each parameter configuration
         # params[2] is the population initialization parameter
-        params = [params + (populations[params[2]],) for params in exp_params]
-        if len(params) == 0:
-            continue
-        # print(f'function = {ff}')
-        # for i, param in enumerate(params):
-        #     print(f'param[{i}] = {param}')
-        experiment_stats_list = [run_experiment(*p) for p in params]
-
-        excel.write_ff_stats(experiment_stats_list)
-        for experiment_stats in experiment_stats_list:
-            del experiment_stats.runs
-            results.append(experiment_stats)
-
-        ff_end_time = time.time()
-        ff_name = experiment_params[ff][0][3][0]
-        log(f'{ff_name} experiments finished in {(ff_end_time - ff_start_time):.2f}s')
-
+        experiments += [params + (populations[params[2]],) for params in exp_params]
+
+    # indices of the experiments of each fitness function, params[3][0] is the fitness function name
+    ff_experiments = {}
+    for exp_i, params in enumerate(experiments):
+        ff_experiments.setdefault(params[3][0], []).append(exp_i)
+
+    experiment_stats_list = [None] * len(experiments)
+    # one pool of workers for all the runs of all experiments, the workers are stopped
+    # even if an experiment or a table fails
+    with Pool(THREADS) as pool:
+        for exp_i, experiment_stats in run_experiments(experiments, pool):
+            experiment_stats_list[exp_i] = experiment_stats
+
+            # write the table of a fitness function as soon as all its experiments are finished
+            ff_name = experiment_stats.params[0]
+            if all(experiment_stats_list[i] is not None for i in ff_experiments[ff_name]):
+                excel.write_ff_stats([experiment_stats_list[i] for i in ff_experiments[ff_name]])
+                for i in ff_experiments[ff_name]:
+                    del experiment_stats_list[i].runs
+                log(f'{ff_name} experiments finished at +{(time.time() - start_time):.2f}s')
+
+        pool.close()
+        pool.join()
+
+    results = experiment_stats_list
     excel.write_aggregated_stats(results)
 
     print('----------------------------------------------------------------------')
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+def pack(genotypes):
+    """
+    Pack a matrix of 0/1 genes into bytes along the last axis
+    :param genotypes: (n, l) matrix of genes
+    :return: (n, ceil(l/8)) uint8 bit matrix, each row padded with zero bits
+    """
+    return np.packbits(np.asarray(genotypes, dtype=np.uint8), axis=-1)
+
+
+def unpack(bits, length):
+    """
+    Unpack a bit matrix produced by pack
+    :param bits: (n, ceil(l/8)) uint8 bit matrix
+    :param length: number of genes in a row
+    :return: (n, l) uint8 matrix of 0/1 genes
+    """
+    return np.unpackbits(bits, axis=-1, count=length)
+
+
+def flip(bits, rows, cols):
+    """
+    Flip single genes of a bit matrix in place
+    :param rows: row index of every gene to flip
+    :param cols: position of every gene to flip within its row
+    """
+    cols = np.asarray(cols)
+    np.bitwise_xor.at(bits, (rows, cols >> 3), (0x80 >> (cols & 7)).astype(np.uint8))
+
+
+def get(bits, rows, cols):
+    """
+    Read single genes of a bit matrix
+    :param rows: row index of every gene to read
+    :param cols: position of every gene to read within its row
+    :return: uint8 vector of 0/1 genes
+    """
+    cols = np.asarray(cols)
+    return (bits[rows, cols >> 3] >> (7 - (cols & 7)).astype(np.uint8)) & 1
+
+
+def count_ones(bits, length):
+    """
+    Count the ones at every gene position of a bit matrix
+    :return: int64 vector of length l
+    """
+    return np.count_nonzero(unpack(bits, length), axis=0).astype(np.int64)
+
+
+FINGERPRINT_DTYPE = np.dtype([('hi', np.uint64), ('lo', np.uint64)])
+_HASH_SEEDS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+_HASH_PRIMES = (np.uint64(0x100000001B3), np.uint64(0xFF51AFD7ED558CCD))
+
+
+def fingerprints(bits):
+    """
+    Compute a fingerprint of every row of a bit matrix, so that equal rows have equal fingerprints.
+    Rows of up to 64 genes are stored in a single uint64, which is exact. Longer rows are hashed
+    into two independent 64-bit lanes
+    :return: uint64 vector for rows of up to 8 bytes, FINGERPRINT_DTYPE vector otherwise
+    """
+    n_rows, n_bytes = bits.shape
+    n_words = max(1, -(-n_bytes // 8))
+    padded = np.zeros((n_rows, n_words * 8), dtype=np.uint8)
+    padded[:, :n_bytes] = bits
+    words = padded.view('>u8').astype(np.uint64)
+    if n_words == 1:
+        return words[:, 0]
+
+    result = np.empty(n_rows, dtype=FINGERPRINT_DTYPE)
+    for lane, seed, prime in zip(('hi', 'lo'), _HASH_SEEDS, _HASH_PRIMES):
+        h = np.full(n_rows, seed, dtype=np.uint64)
+        for word_i in range(n_words):
+            h = (h ^ words[:, word_i]) * prime
+            h ^= h >> np.uint64(29)
+        result[lane] = h
+    return result
@@ -1,8 +1,17 @@
 class Chromosome:
-    def __init__(self, id, genotype, fitness_function):
+    """
+    A single individual. The chromosomes handed out by Population.chromosomes are lightweight views:
+    the genotype is a read-only row of the population's genotype matrix and the fitness is taken
+    from its fitness vector instead of being evaluated again.
+    """
+    def __init__(self, id, genotype, fitness_function, fitness=None):
         self.id = id
         self.fitness_function = fitness_function
-        self.set_genotype(genotype)
+        if fitness is None:
+            self.set_genotype(genotype)
+        else:
+            self.genotype = genotype
+            self.fitness = fitness
 
     def set_genotype(self, genotype):
         self.genotype = genotype
@@ -12,10 +21,10 @@ class Chromosome:
         self.fitness = self.fitness_function.apply(self.genotype)
 
     def __copy__(self):
-        return Chromosome(self.id, self.genotype.copy(), self.fitness_function)
+        return Chromosome(self.id, self.genotype.copy(), self.fitness_function, self.fitness)
     
     def __deepcopy__(self, memo):
         return self.__copy__()
 
     def __str__(self):
-        return f"Chr{self.id}({str(self.genotype.tobytes().decode('utf-8'))})"
+        return f"Chr{self.id}({''.join(str(gene) for gene in self.genotype)})"
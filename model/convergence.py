@@ -0,0 +1,16 @@
+class ConvergenceChecks:
+    """
+    Convergence checks of Population, GenotypeMultiset and PopulationBatch, built on their
+    is_homogeneous_frac and is_homogenous_100. For a PopulationBatch they return a vector
+    with an entry per population
+    """
+    def has_converged(self, param_names):
+        has_gen_op = param_names[2] != 'no_operators'
+
+        if not has_gen_op:
+            return self.is_homogenous_100()
+
+        return self.is_homogenous_99()
+
+    def is_homogenous_99(self):
+        return self.is_homogeneous_frac(0.99)
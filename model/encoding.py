@@ -1,5 +1,74 @@
 import numpy as np
 
+WORD_SIZE = 64
+
+
+def bits_to_int(encoded):
+    """
+    Convert a 0/1 gene array (most significant bit first) to a non-negative integer
+    """
+    return int.from_bytes(np.packbits(encoded).tobytes(), 'big') >> (-len(encoded) % 8)
+
+
+def bits_to_words(encoded):
+    """
+    Convert the rows of a genotype matrix to integers split into 64-bit words,
+    each word being a dot product of its genes with powers of two
+    :param encoded: (n, l) matrix of 0/1 genes, most significant bit first
+    :return: (n, ceil(l/64)) uint64 matrix, word 0 holding the least significant bits
+    """
+    encoded = np.asarray(encoded)
+    length = encoded.shape[-1]
+    n_words = max(1, -(-length // WORD_SIZE))
+    words = np.empty(encoded.shape[:-1] + (n_words,), dtype=np.uint64)
+    for word_i in range(n_words):
+        stop = length - word_i * WORD_SIZE
+        start = max(0, stop - WORD_SIZE)
+        powers = np.uint64(1) << np.arange(stop - start - 1, -1, -1, dtype=np.uint64)
+        words[..., word_i] = encoded[..., start:stop].astype(np.uint64) @ powers
+    return words
+
+
+def words_to_bits(words, length):
+    """
+    Inverse of bits_to_words
+    """
+    weights = np.arange(length - 1, -1, -1)
+    shifts = (weights % WORD_SIZE).astype(np.uint64)
+    return ((words[..., weights // WORD_SIZE] >> shifts) & np.uint64(1)).astype(np.uint8)
+
+
+def words_to_ints(words):
+    """
+    Combine 64-bit words into integers: uint64 for a single word, Python ints otherwise
+    """
+    if words.shape[-1] == 1:
+        return words[..., 0]
+    ints = np.zeros(words.shape[:-1], dtype=object)
+    for word_i in range(words.shape[-1]):
+        ints += words[..., word_i].astype(object) << (WORD_SIZE * word_i)
+    return ints
+
+
+def ints_to_words(nums, n_words):
+    """
+    Split non-negative integers into n_words 64-bit words
+    """
+    nums = np.asarray(nums)
+    if n_words == 1:
+        return nums.astype(np.uint64)[..., np.newaxis]
+    nums = nums.astype(object)
+    return np.stack([((nums >> (WORD_SIZE * word_i)) & (2**WORD_SIZE - 1)).astype(np.uint64)
+                     for word_i in range(n_words)], axis=-1)
+
+
+def words_to_floats(words):
+    """
+    Combine 64-bit words into float64 values
+    """
+    return words.astype(np.float64) @ (2.0 ** (WORD_SIZE * np.arange(words.shape[-1])))
+
+
 class Encoder:
     def __init__(self, length):
         self.length: int = length
@@ -9,10 +78,25 @@ class Encoder:
 
     def decode(self, encoded):
         raise NotImplementedError()
+
+    def encode_batch(self, nums):
+        """
+        Encode a vector of n values into an (n, length) genotype matrix
+        """
+        return np.array([self.encode(num) for num in nums], dtype=np.uint8).reshape(len(nums), self.length)
+
+    def decode_batch(self, encoded):
+        """
+        Decode every row of an (n, length) genotype matrix into a vector of n values
+        """
+        return np.array([self.decode(e) for e in encoded])
     
     def get_all_values(self):
         raise NotImplementedError()
 
+    def n_words(self):
+        return max(1, -(-self.length // WORD_SIZE))
+
 class BinaryEncoder(Encoder):
     def __init__(self, length):
         self.length: int = length
@@ -21,14 +105,26 @@ class BinaryEncoder(Encoder):
     def encode(self, num):
         encoded_str = bin(num)[2:]
         encoded_str = '0'*(self.length - len(encoded_str)) + encoded_str
-        encoded = np.array(list(encoded_str), dtype=bytes)
+        encoded = np.frombuffer(encoded_str.encode(), dtype=np.uint8) - ord('0')
         return encoded
     
     def decode(self, encoded):
-        return int(encoded.tobytes(), 2)
+        return bits_to_int(encoded)
+
+    def encode_words(self, words):
+        return words_to_bits(words, self.length)
+
+    def decode_words(self, encoded):
+        return bits_to_words(encoded)
+
+    def encode_batch(self, nums):
+        return self.encode_words(ints_to_words(nums, self.n_words()))
+
+    def decode_batch(self, encoded):
+        return words_to_ints(self.decode_words(encoded))
     
     def get_all_values(self):
-        return [self.encode(v) for v in range(2**self.length)]
+        return self.encode_batch(np.arange(2**self.length))
 
 class GrayEncoder(Encoder):
     def __init__(self, length):
@@ -38,20 +134,36 @@ class GrayEncoder(Encoder):
         num ^= (num >> 1)
         encoded_str = bin(num)[2:]
         encoded_str = '0'*(self.length - len(encoded_str)) + encoded_str
-        encoded = np.array(list(encoded_str), dtype=bytes)
+        encoded = np.frombuffer(encoded_str.encode(), dtype=np.uint8) - ord('0')
         return encoded
     
     def decode(self, encoded):
-        decoded = int(encoded.tobytes(), 2)
-        decoded ^= decoded >> 16
-        decoded ^= decoded >> 8
-        decoded ^= decoded >> 4
-        decoded ^= decoded >> 2
-        decoded ^= decoded >> 1
+        decoded = bits_to_int(encoded)
+        shift = 1
+        while shift * 2 < self.length:
+            shift *= 2
+        while shift > 0:
+            decoded ^= decoded >> shift
+            shift //= 2
         return decoded
+
+    def encode_words(self, words):
+        encoded = words_to_bits(words, self.length)
+        encoded[..., 1:] ^= encoded[..., :-1].copy()
+        return encoded
+
+    def decode_words(self, encoded):
+        # the i-th binary bit is the XOR of the first i+1 Gray bits
+        return bits_to_words(np.bitwise_xor.accumulate(encoded, axis=-1))
+
+    def encode_batch(self, nums):
+        return self.encode_words(ints_to_words(nums, self.n_words()))
+
+    def decode_batch(self, encoded):
+        return words_to_ints(self.decode_words(encoded))
     
     def get_all_values(self):
-        return [self.encode(v) for v in range(2**self.length)]
+        return self.encode_batch(np.arange(2**self.length))
 
 class FloatEncoder(Encoder):
     def __init__(self, lower_bound, upper_bound, length, is_gray=False):
@@ -75,6 +187,16 @@ class FloatEncoder(Encoder):
         n = self.sub_encoder.decode(encoded)
         decoded = self.lower_bound + n * self.__decoding_multiplier
         return decoded
+
+    def encode_batch(self, nums):
+        n = np.rint((np.asarray(nums, dtype=np.float64) - self.lower_bound) * self.__encoding_multiplier)
+        if self.n_words() > 1:
+            n = np.array([int(v) for v in n], dtype=object)
+        return self.sub_encoder.encode_batch(n)
+
+    def decode_batch(self, encoded):
+        n = words_to_floats(self.sub_encoder.decode_words(encoded))
+        return self.lower_bound + n * self.__decoding_multiplier
     
     def get_all_values(self):
         return self.sub_encoder.get_all_values()
@@ -0,0 +1,105 @@
+import numpy as np
+import os
+import tempfile
+import weakref
+from collections import OrderedDict
+from config import FITNESS_TABLE_MAX_LENGTH, FITNESS_CACHE_SIZE
+from model.encoding import bits_to_words, words_to_bits
+
+# tables are stored in RAM-backed files when the system provides them
+TABLE_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+TABLE_CHUNK = 2**16
+
+
+class FitnessCache:
+    """
+    Fitness lookup for functions whose fitness depends only on the genotype.
+    The genotypes are looked up in batches, only the missing ones are computed
+    with fitness_function.compute_batch
+    """
+    @staticmethod
+    def create(fitness_function):
+        if fitness_function.chr_length <= FITNESS_TABLE_MAX_LENGTH:
+            return FitnessTable(fitness_function)
+        return LRUFitnessCache(fitness_function, FITNESS_CACHE_SIZE)
+
+    def lookup(self, genotypes):
+        """
+        :param genotypes: (n, l) matrix of 0/1 genes
+        :return: float64 vector of n fitnesses
+        """
+        raise NotImplementedError()
+
+
+class FitnessTable(FitnessCache):
+    """
+    Dense table of the fitnesses of all 2^l genotypes, indexed by the genotype read as a binary integer.
+    The table is written once into a memory-mapped file; pickled copies (e.g. the ones sent to
+    worker processes) only carry the file path and map the same pages instead of copying the table
+    """
+    def __init__(self, fitness_function):
+        length = fitness_function.chr_length
+        size = 2**length
+        fd, self.path = tempfile.mkstemp(prefix='fitness_table_', suffix='.npy', dir=TABLE_DIR)
+        os.close(fd)
+        weakref.finalize(self, FitnessTable.__remove, self.path, os.getpid())
+
+        table = np.lib.format.open_memmap(self.path, mode='w+', dtype=np.float64, shape=(size,))
+        for start in range(0, size, TABLE_CHUNK):
+            indices = np.arange(start, min(start + TABLE_CHUNK, size), dtype=np.uint64)
+            table[start:start + len(indices)] = fitness_function.compute_batch(words_to_bits(indices[:, np.newaxis], length))
+        table.flush()
+        del table
+        self.table = np.load(self.path, mmap_mode='r')
+
+    def lookup(self, genotypes):
+        return self.table[bits_to_words(genotypes)[:, 0]]
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.table = np.load(self.path, mmap_mode='r')
+
+    @staticmethod
+    def __remove(path, owner_pid):
+        # only the process that built the table deletes the file
+        if os.getpid() == owner_pid and os.path.exists(path):
+            os.remove(path)
+
+
+class LRUFitnessCache(FitnessCache):
+    """
+    Bounded cache of recently seen genotypes, for chromosomes too long to tabulate
+    """
+    def __init__(self, fitness_function, max_size):
+        self.fitness_function = fitness_function
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def lookup(self, genotypes):
+        fitnesses = np.empty(len(genotypes), dtype=np.float64)
+        keys = [genotype.tobytes() for genotype in genotypes]
+        missing = []
+        for i, key in enumerate(keys):
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                fitnesses[i] = self.entries[key]
+            else:
+                missing.append(i)
+
+        if missing:
+            fitnesses[missing] = self.fitness_function.compute_batch(genotypes[missing])
+            for i in missing:
+                self.entries[keys[i]] = fitnesses[i]
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return fitnesses
+
+    def __getstate__(self):
+        # every process fills its own cache
+        return {'fitness_function': self.fitness_function, 'max_size': self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state['fitness_function'], state['max_size'])
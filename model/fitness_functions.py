@@ -3,7 +3,7 @@ from config import DELTA, SIGMA, get_pop_seed
 from model.chromosome import Chromosome
 from model.population import Population
 from model.encoding import Encoder
-from math import exp
+from model.fitness_cache import FitnessCache
 
 
 class FitnessFunc:
@@ -16,12 +16,26 @@ class FitnessFunc:
     def apply(self, genotype):
         raise NotImplementedError()
 
+    def apply_batch(self, genotypes):
+        """
+        Calculate the fitnesses of many genotypes at once
+        :param genotypes: (n, l) matrix of 0/1 genes
+        :return: float64 vector of n fitnesses
+        """
+        return np.array([self.apply(genotype) for genotype in genotypes], dtype=np.float64)
+
     def get_optimal(self):
         raise NotImplementedError()
     
     def get_phenotype(self, genotype):
         raise NotImplementedError()
 
+    def get_phenotype_batch(self, genotypes):
+        """
+        Calculate the phenotypes of every row of an (n, l) genotype matrix
+        """
+        return self.encoder.decode_batch(genotypes)
+
     def generate_population_for_run(self, run_i, n_optimal=1):
         return Population(self, seed=get_pop_seed(run_i), n_optimal=n_optimal)
     
@@ -30,22 +44,42 @@ class FitnessFunc:
         x_diff = abs(self.get_phenotype(chr.genotype) - self.get_phenotype(self.get_optimal().genotype))
         return y_diff <= DELTA and x_diff <= SIGMA
 
+    def check_success_batch(self, genotypes, fitnesses):
+        """
+        Vectorized check_chromosome_success for every row of an (n, l) genotype matrix
+        :return: boolean vector of n values
+        """
+        optimal = self.get_optimal()
+        phenotypes = self.get_phenotype_batch(genotypes).astype(np.float64)
+        y_diff = np.abs(fitnesses - optimal.fitness)
+        x_diff = np.abs(phenotypes - float(self.get_phenotype(optimal.genotype)))
+        return (y_diff <= DELTA) & (x_diff <= SIGMA)
+
 
 class FconstALL(FitnessFunc):
     def apply(self, genotype):
         return 100
 
+    def apply_batch(self, genotypes):
+        return np.full(len(genotypes), 100, dtype=np.float64)
+
     def get_optimal(self):
         if not self.optimal:
-            self.optimal = Chromosome(0, np.full(self.chr_length, b'0'), self)
+            self.optimal = Chromosome(0, np.zeros(self.chr_length, dtype=np.uint8), self)
         return self.optimal
     
     def get_phenotype(self, genotype):
         return 0
+
+    def get_phenotype_batch(self, genotypes):
+        return np.zeros(len(genotypes))
     
     def check_chromosome_success(self, ch):
         return True
 
+    def check_success_batch(self, genotypes, fitnesses):
+        return np.ones(len(genotypes), dtype=bool)
+
 
 class FHD(FitnessFunc):
     def __init__(self, delta, chr_length):
@@ -53,16 +87,23 @@ class FHD(FitnessFunc):
         self.delta = delta
 
     def apply(self, genotype):
-        k = len([True for gene in genotype if gene == b'0'])
+        k = self.chr_length - np.count_nonzero(genotype)
         return (self.chr_length - k) + k * self.delta
 
+    def apply_batch(self, genotypes):
+        k = self.chr_length - np.count_nonzero(genotypes, axis=1)
+        return ((self.chr_length - k) + k * self.delta).astype(np.float64)
+
     def get_optimal(self):
         if not self.optimal:
-            self.optimal = Chromosome(0, np.full(self.chr_length, b'0'), self)
+            self.optimal = Chromosome(0, np.zeros(self.chr_length, dtype=np.uint8), self)
         return self.optimal
 
     def get_phenotype(self, genotype):
-        return len([True for gene in genotype if gene == b'1'])
+        return np.count_nonzero(genotype)
+
+    def get_phenotype_batch(self, genotypes):
+        return np.count_nonzero(genotypes, axis=1)
 
 
 class FH(FitnessFunc):
@@ -74,12 +115,18 @@ class FH(FitnessFunc):
     def apply(self, genotype):
         if len(genotype) != self.chr_length:
             raise ValueError("Incorrect length of genotype!")
-        k = len([True for gene in genotype if gene == b'1'])
+        k = np.count_nonzero(genotype)
         return (self.chr_length - k)
 
+    def apply_batch(self, genotypes):
+        if genotypes.shape[1] != self.chr_length:
+            raise ValueError("Incorrect length of genotype!")
+        k = np.count_nonzero(genotypes, axis=1)
+        return (self.chr_length - k).astype(np.float64)
+
     def get_optimal(self):
         if not self.optimal:
-            self.optimal = Chromosome(0, np.full(self.chr_length, b'0'), self)
+            self.optimal = Chromosome(0, np.zeros(self.chr_length, dtype=np.uint8), self)
         return self.optimal
 
     def get_phenotype(self, genotype):
@@ -87,21 +134,38 @@ class FH(FitnessFunc):
             raise ValueError("Incorrect length of genotype!")
         return self.encoder.decode(genotype)
 
+    def get_phenotype_batch(self, genotypes):
+        if genotypes.shape[1] != self.chr_length:
+            raise ValueError("Incorrect length of genotype!")
+        return self.encoder.decode_batch(genotypes)
+
 
-class Fx2(FitnessFunc):
+class CachedFitnessFunc(FitnessFunc):
+    """
+    A fitness function of a value decoded from the genotype. Fitnesses are calculated by
+    compute_batch and looked up through a FitnessCache
+    """
     def __init__(self, encoder: Encoder):
         super().__init__(encoder.length)
         self.encoder = encoder
-        self.is_caching = encoder.length <= 12
-        self.cache_dict = {}
-        if self.is_caching:
-            for v in self.encoder.get_all_values():
-                self.cache_dict[v.tobytes()] = self.encoder.decode(v)**2
+        self.cache = FitnessCache.create(self)
+
+    def compute_batch(self, genotypes):
+        raise NotImplementedError()
 
     def apply(self, genotype):
-        if self.is_caching:
-            return self.cache_dict[genotype.tobytes()]
-        return self.encoder.decode(genotype)**2
+        return self.cache.lookup(genotype[np.newaxis])[0]
+
+    def apply_batch(self, genotypes):
+        return self.cache.lookup(genotypes)
+
+    def get_phenotype(self, genotype):
+        return self.encoder.decode(genotype)
+
+
+class Fx2(CachedFitnessFunc):
+    def compute_batch(self, genotypes):
+        return self.encoder.decode_batch(genotypes)**2
 
     def get_optimal(self):
         if not self.optimal:
@@ -109,49 +173,24 @@ class Fx2(FitnessFunc):
             self.optimal = Chromosome(0, optimal_genotype, self)
         return self.optimal
 
-    def get_phenotype(self, genotype):
-        return self.encoder.decode(genotype)
-
 
-class F5122subx2(FitnessFunc):
-    def __init__(self, encoder: Encoder):
-        super().__init__(encoder.length)
-        self.encoder = encoder
-        self.is_caching = encoder.length <= 12
-        self.cache_dict = {}
-        if self.is_caching:
-            for v in self.encoder.get_all_values():
-                self.cache_dict[v.tobytes()] = 5.12**2 - self.encoder.decode(v)**2
-
-    def apply(self, genotype):
-        if self.is_caching:
-            return self.cache_dict[genotype.tobytes()]
-        return 5.12**2 - self.encoder.decode(genotype)**2
+class F5122subx2(CachedFitnessFunc):
+    def compute_batch(self, genotypes):
+        return 5.12**2 - self.encoder.decode_batch(genotypes)**2
 
     def get_optimal(self):
         if not self.optimal:
             optimal_genotype = self.encoder.encode(0)
             self.optimal =  Chromosome(0, optimal_genotype, self)
         return self.optimal
-
-    def get_phenotype(self, genotype):
-        return self.encoder.decode(genotype)
     
-class Fexp(FitnessFunc):
+class Fexp(CachedFitnessFunc):
     def __init__(self, c, encoder: Encoder):
         self.c = c
-        super().__init__(encoder.length)
-        self.encoder = encoder
-        self.is_caching = encoder.length <= 12
-        self.cache_dict = {}
-        if self.is_caching:
-            for v in self.encoder.get_all_values():
-                self.cache_dict[v.tobytes()] = exp(self.c * self.encoder.decode(v))
+        super().__init__(encoder)
 
-    def apply(self, genotype):
-        if self.is_caching:
-            return self.cache_dict[genotype.tobytes()]
-        return exp(self.c * self.encoder.decode(genotype))
+    def compute_batch(self, genotypes):
+        return np.exp(self.c * self.encoder.decode_batch(genotypes))
 
     def get_optimal(self):
         if not self.optimal:
@@ -159,30 +198,18 @@ class Fexp(FitnessFunc):
             self.optimal =  Chromosome(0, optimal_genotype, self)
         return self.optimal
 
-    def get_phenotype(self, genotype):
-        return self.encoder.decode(genotype)
-
 
-class Rastrigin(FitnessFunc):
+class Rastrigin(CachedFitnessFunc):
     def __init__(self, a, encoder: Encoder):
         self.a = a
-        super().__init__(encoder.length)
-        self.encoder = encoder
-        self.is_caching = encoder.length <= 12
-        self.cache_dict = {}
-        if self.is_caching:
-            for v in self.encoder.get_all_values():
-                self.cache_dict[v.tobytes()] = self.__apply(v)
-
-    def __apply(self, genotype):
-        x = self.encoder.decode(genotype)
+        super().__init__(encoder)
+
+    def __apply(self, x):
         return np.abs(10 * np.cos(2 * np.pi * self.a) - self.a ** 2) \
                     + 10 * np.cos(2 * np.pi * x) - x**2
 
-    def apply(self, genotype):
-        if self.is_caching:
-            return self.cache_dict[genotype.tobytes()]
-        return self.__apply(genotype)
+    def compute_batch(self, genotypes):
+        return self.__apply(self.encoder.decode_batch(genotypes))
 
     def get_optimal(self):
         if not self.optimal:
@@ -190,28 +217,13 @@ class Rastrigin(FitnessFunc):
             self.optimal = Chromosome(0, optimal_genotype, self)
         return self.optimal
 
-    def get_phenotype(self, genotype):
-        return self.encoder.decode(genotype)
-
 
-class Deb2(FitnessFunc):
-    def __init__(self, encoder: Encoder):
-        super().__init__(encoder.length)
-        self.encoder = encoder
-        self.is_caching = encoder.length <= 12
-        self.cache_dict = {}
-        if self.is_caching:
-            for v in self.encoder.get_all_values():
-                self.cache_dict[v.tobytes()] = self.__apply(v)
-
-    def __apply(self, genotype):
-        x = self.encoder.decode(genotype)
+class Deb2(CachedFitnessFunc):
+    def __apply(self, x):
         return np.exp(-2 * np.log(2) * ((x - 0.1) / 0.8) ** 2) * np.sin(5 * np.pi * x) ** 6
 
-    def apply(self, genotype):
-        if self.is_caching:
-            return self.cache_dict[genotype.tobytes()]
-        return self.__apply(genotype)
+    def compute_batch(self, genotypes):
+        return self.__apply(self.encoder.decode_batch(genotypes))
 
     def get_optimal(self):
         if not self.optimal:
@@ -219,29 +231,14 @@ class Deb2(FitnessFunc):
             self.optimal = Chromosome(0, optimal_genotype, self)
         return self.optimal
 
-    def get_phenotype(self, genotype):
-        return self.encoder.decode(genotype)
-
 
-class Deb4(FitnessFunc):
-    def __init__(self, encoder: Encoder):
-        super().__init__(encoder.length)
-        self.encoder = encoder
-        self.is_caching = encoder.length <= 12
-        self.cache_dict = {}
-        if self.is_caching:
-            for v in self.encoder.get_all_values():
-                self.cache_dict[v.tobytes()] = self.__apply(v)
-
-    def __apply(self, genotype):
-        x = self.encoder.decode(genotype)
+class Deb4(CachedFitnessFunc):
+    def __apply(self, x):
         return np.exp(-2 * np.log(2) * ((x - 0.08) / 0.854) ** 2) * \
             np.sin(5 * np.pi * (x ** 0.75 - 0.05)) ** 6
 
-    def apply(self, genotype):
-        if self.is_caching:
-            return self.cache_dict[genotype.tobytes()]
-        return self.__apply(genotype)
+    def compute_batch(self, genotypes):
+        return self.__apply(self.encoder.decode_batch(genotypes))
 
     def get_optimal(self):
         if not self.optimal:
@@ -249,16 +246,13 @@ class Deb4(FitnessFunc):
             self.optimal = Chromosome(0, optimal_genotype, self)
         return self.optimal
 
-    def get_phenotype(self, genotype):
-        return self.encoder.decode(genotype)
-
 
 if __name__ == "__main__":
     from model.encoding import *
     print("---------------------------")
     print("FH")
     fh = FH(BinaryEncoder(7))
-    genotype = np.array([b'0', b'0', b'0', b'1', b'0', b'0', b'1'])
+    genotype = np.array([0, 0, 0, 1, 0, 0, 1], dtype=np.uint8)
     print(f'The fitness of {genotype} is: {fh.apply(genotype)}')
     # print(fh.apply(b'0')) # raises ValueError
     print(f'The optimal chromosome is: {fh.get_optimal()}')
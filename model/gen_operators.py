@@ -1,114 +1,194 @@
 from model.population import Population
+from model.population_batch import PopulationBatch
+from model.random_source import RandomSource
 from config import N, get_p_m
-import random
 import numpy as np
-from model.chromosome import Chromosome
+from model import bit_matrix
 
 class GeneticOperator:
     @staticmethod
-    def apply(population: Population):
+    def apply(population: Population, rng: RandomSource):
+        """
+        :param rng: random source of the run
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def apply_batch(batch: PopulationBatch, rngs):
+        """
+        Apply the operator to all populations of a lockstep batch
+        :param rngs: random source of every population
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def sample_quiet_generations(population: Population, rng: RandomSource):
+        """
+        Sample the number of generations until the operator next changes a population that selection
+        leaves as it is. The generation after them has to apply the operator with apply_event
+        :return: number of generations, np.inf if the operator never changes the population,
+                 None if it cannot be sampled
+        """
+        return None
+
+    @staticmethod
+    def apply_event(population: Population, rng: RandomSource):
+        """
+        Apply the operator conditioned on changing the population, see sample_quiet_generations
+        """
         raise NotImplementedError()
 
 
 class BlankGenOperator(GeneticOperator):
     @staticmethod
-    def apply(population):
-        for chr_i in range(N):
-            population.chromosomes[chr_i].id = chr_i
+    def apply(population, rng):
+        population.reset_ids()
+
+    @staticmethod
+    def apply_batch(batch: PopulationBatch, rngs):
+        batch.reset_ids()
+
+    @staticmethod
+    def sample_quiet_generations(population, rng):
+        return np.inf
 
 
 class Crossover(GeneticOperator):
     @staticmethod
-    def apply(population: Population):
-        np.random.shuffle(population.chromosomes)
-        children = np.empty(N, dtype=object)
-        l = population.fitness_function.chr_length
-
-        for i in range(N // 2):
-            chr_are_equal = True
-            for j in range(l):
-                if population.chromosomes[i*2].genotype[j] != population.chromosomes[i*2+1].genotype[j]:
-                    chr_are_equal = False
-                    break
-
-            if chr_are_equal:
-                children[i*2] = population.chromosomes[i*2]
-                children[i*2+1] = population.chromosomes[i*2+1]
-                children[i*2].id = i*2
-                children[i*2+1].id = i*2+1
-            else:
-                crossing_point = np.random.randint(1, l)
-
-                genotype1 = np.concatenate([
-                    population.chromosomes[i*2].genotype[:crossing_point],
-                    population.chromosomes[i*2+1].genotype[crossing_point:]
-                ])
-                genotype2 = np.concatenate([
-                    population.chromosomes[i*2+1].genotype[:crossing_point],
-                    population.chromosomes[i*2].genotype[crossing_point:]
-                ])
-                
-                children[i*2] = Chromosome(i*2, genotype1, population.fitness_function)
-                children[i*2+1] = Chromosome(i*2+1, genotype2, population.fitness_function)
-        population.update_chromosomes(children)
+    def apply(population: Population, rng):
+        """
+        One-point crossover of randomly paired chromosomes, computed for all pairs at once
+        on the packed bit matrix. Pairs of identical chromosomes are left as they are
+        """
+        order = rng.permutation(N)
+        parents = population.bits[order]
+        l = population.length
+        n_pairs = N // 2
+        first = parents[0:n_pairs*2:2]
+        second = parents[1:n_pairs*2:2]
+
+        crossed = np.flatnonzero(np.any(first != second, axis=1))
+        crossing_points = rng.integers(1, l, size=len(crossed))
+        # genes from the crossing point on are swapped between the parents
+        swap_mask = bit_matrix.pack(np.arange(l) >= crossing_points[:, np.newaxis])
+        swapped = (first[crossed] ^ second[crossed]) & swap_mask
+
+        children = parents.copy()
+        children[crossed*2] ^= swapped
+        children[crossed*2+1] ^= swapped
+
+        # swapping genes within a pair leaves the number of ones at every locus unchanged
+        population.set_bits(children, fitnesses=population.fitnesses[order], ones=population.ones,
+                            fingerprints=population.fingerprints[order])
+        population.refresh(np.concatenate([crossed*2, crossed*2+1]))
+
+    @staticmethod
+    def apply_batch(batch: PopulationBatch, rngs):
+        runs = np.arange(len(batch))[:, np.newaxis]
+        orders = np.stack([rng.permutation(N) for rng in rngs])
+        parents = batch.bits[runs, orders]
+        l = batch.length
+        n_pairs = N // 2
+        first = parents[:, 0:n_pairs*2:2]
+        second = parents[:, 1:n_pairs*2:2]
+
+        # crossing points are only drawn for the pairs of different chromosomes, in the same
+        # order as in apply, so a run draws the same numbers in a batch as on its own;
+        # a crossing point of l leaves a pair as it is
+        is_crossed = np.any(first != second, axis=2)
+        crossing_points = np.full(is_crossed.shape, l)
+        for run, rng in enumerate(rngs):
+            crossing_points[run, is_crossed[run]] = rng.integers(1, l, size=np.count_nonzero(is_crossed[run]))
+        swap_mask = bit_matrix.pack(np.arange(l) >= crossing_points[..., np.newaxis])
+        swapped = (first ^ second) & swap_mask
+
+        children = parents.copy()
+        children[:, 0:n_pairs*2:2] ^= swapped
+        children[:, 1:n_pairs*2:2] ^= swapped
+
+        batch.set_bits(children, fitnesses=batch.fitnesses[runs, orders],
+                       fingerprints=batch.fingerprints[runs, orders])
+        crossed_runs, crossed = np.nonzero(np.any(swapped, axis=2))
+        batch.refresh(np.concatenate([crossed_runs, crossed_runs]), np.concatenate([crossed*2, crossed*2+1]))
 
 
 class Mutation(GeneticOperator):
     @staticmethod
-    def apply(population: Population):
-        l = population.fitness_function.chr_length
+    def apply(population: Population, rng):
+        """
+        Flip every gene of the population independently with probability p_m.
+        Only the flipped genes are drawn, so the work is proportional to the number of flips
+        """
+        l = population.length
+        positions = Mutation.sample_positions(N * l, get_p_m(l), rng)
+        if len(positions) > 0:
+            population.flip_genes(positions // l, positions % l)
+        population.reset_ids()
+
+    @staticmethod
+    def apply_batch(batch: PopulationBatch, rngs):
+        l = batch.length
+        runs = []
+        positions = []
+        for run, rng in enumerate(rngs):
+            run_positions = Mutation.sample_positions(N * l, get_p_m(l), rng)
+            runs.append(np.full(len(run_positions), run))
+            positions.append(run_positions)
+        positions = np.concatenate(positions)
+        if len(positions) > 0:
+            batch.flip_genes(np.concatenate(runs), positions // l, positions % l)
+        batch.reset_ids()
+
+    @staticmethod
+    def sample_quiet_generations(population: Population, rng):
+        # a generation is quiet if none of its N*L genes is flipped
+        p_flip = Mutation.__flip_probability(population.length)
+        return rng.geometric(p_flip) - 1
+
+    @staticmethod
+    def apply_event(population: Population, rng):
+        l = population.length
+        n_genes = N * l
         p_m = get_p_m(l)
-        
-        for chromosome in population.chromosomes:
-            for bit_i in range(l):
-                if random.random() < p_m:
-                    chromosome.genotype[bit_i] = int(not chromosome.genotype[bit_i])
-                    chromosome.update_fitness()
+        # the first flipped gene is geometrically distributed, truncated to the genes of the population
+        u = rng.random()
+        first = int(np.ceil(np.log1p(-u * Mutation.__flip_probability(l)) / np.log1p(-p_m))) - 1
+        first = min(max(first, 0), n_genes - 1)
+        positions = np.concatenate([[first], first + 1 + Mutation.sample_positions(n_genes - first - 1, p_m, rng)])
+        population.flip_genes(positions // l, positions % l)
+        population.reset_ids()
+
+    @staticmethod
+    def __flip_probability(l):
+        """
+        :return: probability that a generation flips at least one gene
+        """
+        return -np.expm1(N * l * np.log1p(-get_p_m(l)))
 
-        for chr_i in range(N):
-            population.chromosomes[chr_i].id = chr_i
-            
-        population.update()
+    @staticmethod
+    def sample_positions(n_genes, p_m, rng: RandomSource):
+        """
+        Sample the genes hit by independent Bernoulli(p_m) trials, walking through
+        the n_genes positions with geometrically distributed gaps. The gaps are drawn
+        in blocks a few standard deviations longer than the expected number of hits
+        :param rng: random source of the run
+        :return: sorted array of flat gene positions
+        """
+        expected = n_genes * p_m
+        block = int(expected + 4 * np.sqrt(expected)) + 1
+        positions = np.cumsum(rng.geometric(p_m, size=block)) - 1
+        while positions[-1] < n_genes:
+            positions = np.concatenate([positions, positions[-1] + np.cumsum(rng.geometric(p_m, size=block))])
+        return positions[:np.searchsorted(positions, n_genes)]
 
 
 class CrossoverAndMutation(GeneticOperator):
     @staticmethod
-    def apply(population: Population):
-        np.random.shuffle(population.chromosomes)
-        children = np.empty(N, dtype=object)
-        l = population.fitness_function.chr_length
-        p_m = get_p_m(l)
+    def apply(population: Population, rng):
+        Crossover.apply(population, rng)
+        Mutation.apply(population, rng)
 
-        for i in range(N // 2):
-            chr_are_equal = True
-            for j in range(l):
-                if population.chromosomes[i*2].genotype[j] != population.chromosomes[i*2+1].genotype[j]:
-                    chr_are_equal = False
-                    break
-
-            if chr_are_equal:
-                children[i*2] = population.chromosomes[i*2]
-                children[i*2+1] = population.chromosomes[i*2+1]
-                children[i*2].id = i*2
-                children[i*2+1].id = i*2+1
-            else:
-                crossing_point = np.random.randint(1, l)
-
-                genotype1 = np.concatenate([
-                    population.chromosomes[i*2].genotype[:crossing_point],
-                    population.chromosomes[i*2+1].genotype[crossing_point:]
-                ])
-                genotype2 = np.concatenate([
-                    population.chromosomes[i*2+1].genotype[:crossing_point],
-                    population.chromosomes[i*2].genotype[crossing_point:]
-                ])
-                
-                children[i*2] = Chromosome(i*2, genotype1, population.fitness_function)
-                children[i*2+1] = Chromosome(i*2+1, genotype2, population.fitness_function)
-        
-        for chromosome in children:
-            for bit_i in range(l):
-                if random.random() < p_m:
-                    chromosome.genotype[bit_i] = int(not chromosome.genotype[bit_i])
-                    chromosome.update_fitness()
-        population.update_chromosomes(children)
\ No newline at end of file
+    @staticmethod
+    def apply_batch(batch: PopulationBatch, rngs):
+        Crossover.apply_batch(batch, rngs)
+        Mutation.apply_batch(batch, rngs)
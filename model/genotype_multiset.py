@@ -0,0 +1,89 @@
+import numpy as np
+from config import N
+from model import bit_matrix
+from model.population import Population
+from model.convergence import ConvergenceChecks
+
+
+class GenotypeMultiset(ConvergenceChecks):
+    """
+    A population stored as its distinct genotypes with the number of copies of each. Without genetic
+    operators no new genotypes appear, so selection only changes the counts, and the work on genotypes
+    shrinks with the number of genotypes that survive.
+    The chromosomes are ordered by genotype: the fitness vector and the indices chosen by a selection
+    method refer to the copies of every genotype one after another, so roulette wheel selection is a
+    multinomial draw and SUS a systematic draw over the genotypes weighted by count times fitness
+    """
+    def __init__(self, population: Population):
+        self.fitness_function = population.fitness_function
+        self.length = population.length
+        _, first, counts = np.unique(population.fingerprints, return_index=True, return_counts=True)
+        self.__set(population.bits[first], population.fitnesses[first], population.fingerprints[first], counts)
+        self.parents = None
+
+    def __set(self, bits, fitnesses, fingerprints, counts):
+        """
+        :param bits: packed bit matrix of the distinct genotypes
+        :param fitnesses: fitness of every genotype
+        :param fingerprints: fingerprint of every genotype
+        :param counts: number of copies of every genotype
+        """
+        self.bits = bits
+        self.genotype_fitnesses = fitnesses
+        self.fingerprints = fingerprints
+        self.counts = counts
+        # genotype of every chromosome
+        self.types = np.repeat(np.arange(len(counts)), counts)
+        self.fitnesses = fitnesses[self.types]
+
+    def is_homogeneous_frac(self, frac):
+        """
+        See Population.is_homogeneous_frac
+        """
+        ones = self.counts @ bit_matrix.unpack(self.bits, self.length)
+        percentages = (N - ones) / N
+        return not bool(np.any((percentages > (1 - frac)) & (percentages < frac)))
+
+    def is_homogenous_100(self):
+        return len(self.counts) == 1
+
+    def found_close_to_optimal(self):
+        genotypes = bit_matrix.unpack(self.bits, self.length)
+        return bool(np.any(self.fitness_function.check_success_batch(genotypes, self.genotype_fitnesses)))
+
+    def get_fitness_max(self):
+        return np.max(self.genotype_fitnesses)
+
+    def get_fitness_min(self):
+        return np.min(self.genotype_fitnesses)
+
+    def get_fitness_avg(self):
+        return np.mean(self.fitnesses)
+
+    def get_fitness_std(self):
+        return np.std(self.fitnesses)
+
+    def count_fitness_at_least(self, min_fitness):
+        return int(np.sum(self.counts[self.genotype_fitnesses >= min_fitness]))
+
+    def count_optimal_genotype(self):
+        optimal = bit_matrix.pack(self.fitness_function.get_optimal().genotype)
+        return int(np.sum(self.counts[self.fingerprints == bit_matrix.fingerprints(optimal[np.newaxis])[0]]))
+
+    def get_unique_X(self):
+        return len(self.counts)
+
+    def reset_ids(self):
+        # the copies of a genotype are not told apart, so there are no ids to reset
+        pass
+
+    def select(self, indices):
+        """
+        Replace the population with the chromosomes at the given indices, only the counts
+        of the genotypes change. The indices are kept as the parents of the new chromosomes
+        """
+        counts = np.bincount(self.types[indices], minlength=len(self.counts))
+        survived = np.flatnonzero(counts)
+        self.__set(self.bits[survived], self.genotype_fitnesses[survived], self.fingerprints[survived],
+                   counts[survived])
+        self.parents = indices
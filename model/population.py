@@ -1,43 +1,72 @@
 import numpy as np
 from config import N, EPS, N_LAST_GENS
 from model.chromosome import Chromosome
-from copy import deepcopy, copy
-import random
+from model import bit_matrix
+from model.convergence import ConvergenceChecks
+
+
+class Population(ConvergenceChecks):
+    """
+    A population of N chromosomes stored column-wise: the genotypes are kept as one packed
+    (N, ceil(L/8)) uint8 bit matrix, next to a float64 fitness vector and an id vector.
+    The number of ones at every locus and a fingerprint of every row are kept up to date by
+    selection and the genetic operators, so the homogeneity checks and the unique and optimal
+    counts do not have to compare the genotypes
+    """
+    def __init__(self, fitness_function, seed=0, genotypes=None, ids=None, fitnesses=None, n_optimal=1):
+        self.fitness_function = fitness_function
+        self.length = fitness_function.chr_length
 
+        if genotypes is None:
+            genotypes, ids = self.__generate(seed, n_optimal)
 
-class Population:
-    def __init__(self, fitness_function, seed=0, chromosomes=None, n_optimal=1):
-        self.fitness_function = fitness_function
+        self.set_genotypes(genotypes, ids=ids, fitnesses=fitnesses)
+
+    def __generate(self, seed, n_optimal):
+        """
+        Generate the genotypes of an initial population: n_optimal copies of the optimal chromosome
+        and random non-optimal chromosomes, in an order shuffled by the same seeded generator
+        :param n_optimal: number of optimal chromosomes, or their share of the population if a float
+        :return: (N, L) matrix of genes and the ids of the chromosomes
+        """
+        rng = np.random.default_rng(seed=seed)
+        optimals = n_optimal if isinstance(n_optimal, int) else int(N * n_optimal)
+        optimal_genotype = np.asarray(self.fitness_function.get_optimal().genotype, dtype=np.uint8)
+
+        genotypes = np.empty((N, self.length), dtype=np.uint8)
+        genotypes[:optimals] = optimal_genotype
+        genotypes[optimals:] = rng.integers(0, 2, size=(N - optimals, self.length), dtype=np.uint8)
+        # redraw the random chromosomes that happen to be optimal
+        redraw = optimals + np.flatnonzero(np.all(genotypes[optimals:] == optimal_genotype, axis=1))
+        while len(redraw) > 0:
+            genotypes[redraw] = rng.integers(0, 2, size=(len(redraw), self.length), dtype=np.uint8)
+            redraw = redraw[np.all(genotypes[redraw] == optimal_genotype, axis=1)]
+
+        order = rng.permutation(N)
+        return genotypes[order], np.arange(N)[order]
+
+    @property
+    def genotypes(self):
+        """
+        (N, L) read-only matrix of 0/1 genes, unpacked from the bit matrix on demand
+        """
+        if self._genotypes is None:
+            self._genotypes = bit_matrix.unpack(self.bits, self.length)
+            self._genotypes.flags.writeable = False
+        return self._genotypes
+
+    @property
+    def chromosomes(self):
+        """
+        Chromosome views of the rows of the population
+        """
+        if self._chromosomes is None:
+            self._chromosomes = np.empty(len(self.bits), dtype=object)
+            for chr_i, genotype in enumerate(self.genotypes):
+                self._chromosomes[chr_i] = Chromosome(self.ids[chr_i], genotype, self.fitness_function,
+                                                      fitness=self.fitnesses[chr_i])
+        return self._chromosomes
 
-        if chromosomes is not None:
-            self.chromosomes = chromosomes
-        else:
-            self.chromosomes = np.empty(N, dtype=object)
-            optimals = n_optimal if isinstance(n_optimal, int) else int(N * n_optimal)
-            if optimals > 0:
-                self.chromosomes[0] = copy(fitness_function.get_optimal())
-                optimal_genotype = self.chromosomes[0].genotype
-                for chr_i in range(1, optimals):
-                    self.chromosomes[chr_i] = Chromosome(chr_i, optimal_genotype, fitness_function)
-            rng = np.random.default_rng(seed=seed)
-            for chr_i in range(optimals, N):
-                genotype = optimal_genotype = fitness_function.get_optimal().genotype
-                while np.all(genotype == optimal_genotype):
-                    genotype = rng.choice([b'0', b'1'], fitness_function.chr_length)
-                self.chromosomes[chr_i] = Chromosome(chr_i, genotype, fitness_function)
-
-            random.shuffle(self.chromosomes)
-        
-        self.update()
-
-    def has_converged(self, param_names):
-        has_gen_op = param_names[2] != 'no_operators'
-
-        if not has_gen_op:
-            return self.is_homogenous_100()
-            
-        return self.is_homogenous_99()
-    
     def has_f_avg_converged(self, f_avgs):
         if len(f_avgs) < N_LAST_GENS:
             return False
@@ -50,37 +79,20 @@ class Population:
 
         return all(x <= EPS for x in diffs)
     
-    def is_homogenous_99(self):
-        l = self.fitness_function.chr_length
-        for i in range(l):
-            n_zeros = len([True for g in self.genotypes if g[i] == b'0'])
-            percentage = n_zeros / N
-            if percentage > 0.01 and percentage < 0.99:
-                return False
-        return True
-    
     def is_homogeneous_frac(self, frac):
         """
         check if the population is homogenous by at least (frac*100) percent
         :param frac: 0.5 < frac < 1 - fraction of the population that should have the same value for every gene
         :return: True, if the population satisfies the statement above, False, otherwise
         """
-        l = self.fitness_function.chr_length
-        for i in range(l):
-            n_zeros = len([True for g in self.genotypes if g[i] == b'0'])
-            percentage = n_zeros / N
-            if percentage > (1 - frac) and percentage < frac:
-                return False
-        return True
+        percentages = (N - self.ones) / N
+        return not bool(np.any((percentages > (1 - frac)) & (percentages < frac)))
 
     def is_homogenous_100(self):
-            return all([np.array_equal(geno, self.genotypes[0]) for geno in self.genotypes[1:]])
+        return bool(np.all(self.fingerprints == self.fingerprints[:1]))
 
     def found_close_to_optimal(self):
-        for chr in self.chromosomes:
-            if self.fitness_function.check_chromosome_success(chr):
-                return True
-        return False
+        return bool(np.any(self.fitness_function.check_success_batch(self.genotypes, self.fitnesses)))
 
     def get_fitness_max(self):
         res = np.max(self.fitnesses)
@@ -97,32 +109,124 @@ class Population:
         return np.std(self.fitnesses)
     
     def count_fitness_at_least(self, min_fitness):
-        return len([True for f in self.fitnesses if f >= min_fitness])
+        return int(np.count_nonzero(self.fitnesses >= min_fitness))
 
     def count_optimal_genotype(self):
-        optimal = self.fitness_function.get_optimal().genotype
-        return len([True for g in self.genotypes if np.array_equal(g, optimal)])
+        optimal = bit_matrix.pack(self.fitness_function.get_optimal().genotype)
+        return int(np.count_nonzero(self.fingerprints == bit_matrix.fingerprints(optimal[np.newaxis])[0]))
 
     def get_ids(self):
-        return [chr.id for chr in self.chromosomes]
+        return self.ids
     
     def get_unique_X(self):
         '''
         Find the number of different chromosomes in the population
         '''
-        unique_genotypes = set(tuple(genotype) for genotype in self.genotypes)
-        return len(unique_genotypes)
+        return len(np.unique(self.fingerprints))
 
-    def update(self):
-        self.fitnesses = np.array([chr.fitness for chr in self.chromosomes])
-        self.genotypes = np.array([chr.genotype for chr in self.chromosomes])
+    def evaluate(self, rows=None):
+        """
+        Recalculate the fitnesses of the population
+        :param rows: indices of the chromosomes to re-evaluate, all chromosomes by default
+        """
+        if rows is None:
+            self.fitnesses = self.fitness_function.apply_batch(self.genotypes)
+        elif len(rows) > 0:
+            self.fitnesses[rows] = self.fitness_function.apply_batch(self.genotypes[rows])
+        self._chromosomes = None
+
+    def set_genotypes(self, genotypes, ids=None, fitnesses=None):
+        """
+        Replace the chromosomes of the population
+        :param genotypes: (n, L) matrix of 0/1 genes
+        :param ids: chromosome ids, positional ids by default
+        :param fitnesses: fitnesses of the genotypes, evaluated if not given
+        """
+        genotypes = np.asarray(genotypes, dtype=np.uint8).reshape(-1, self.length)
+        self.set_bits(bit_matrix.pack(genotypes), ids=ids, fitnesses=fitnesses,
+                      ones=np.count_nonzero(genotypes, axis=0).astype(np.int64))
+
+    def set_bits(self, bits, ids=None, fitnesses=None, ones=None, fingerprints=None):
+        """
+        Replace the chromosomes of the population with rows of a packed bit matrix
+        :param ones: number of ones at every locus of the new rows, counted if not given
+        :param fingerprints: fingerprints of the new rows, computed if not given
+        """
+        self.bits = bits
+        self.ids = np.arange(len(bits)) if ids is None else np.asarray(ids)
+        self.ones = bit_matrix.count_ones(bits, self.length) if ones is None else ones
+        self.fingerprints = bit_matrix.fingerprints(bits) if fingerprints is None else fingerprints
+        self.parents = None
+        self._genotypes = None
+        self._chromosomes = None
+        if fitnesses is None:
+            self.evaluate()
+        else:
+            self.fitnesses = np.asarray(fitnesses, dtype=np.float64)
+
+    def flip_genes(self, rows, cols):
+        """
+        Flip single genes and re-evaluate the chromosomes that changed
+        :param rows: chromosome index of every flipped gene
+        :param cols: locus of every flipped gene
+        """
+        bits = self.bits.copy()
+        # every flip adds a one at its locus if the gene was 0 and removes it otherwise
+        changes = 1 - 2 * bit_matrix.get(bits, rows, cols).astype(np.int64)
+        ones = self.ones + np.bincount(cols, weights=changes, minlength=self.length).astype(np.int64)
+        bit_matrix.flip(bits, rows, cols)
+        self.set_bits(bits, ids=self.ids, fitnesses=self.fitnesses.copy(), ones=ones,
+                      fingerprints=self.fingerprints.copy())
+        self.refresh(np.unique(rows))
+
+    def refresh(self, rows):
+        """
+        Re-evaluate the fitnesses and fingerprints of the chromosomes whose genes were changed in place
+        :param rows: indices of the changed chromosomes
+        """
+        self.evaluate(rows)
+        self.fingerprints[rows] = bit_matrix.fingerprints(self.bits[rows])
+
+    def reset_ids(self):
+        self.ids = np.arange(len(self.bits))
+        self._chromosomes = None
+
+    def select(self, indices):
+        """
+        Replace the population with the chromosomes at the given indices, e.g. a mating pool
+        chosen by a selection method. Fitnesses and ids are carried along with the genotypes,
+        and the indices are kept as the parents of the new chromosomes
+        """
+        # only the chromosomes chosen other than exactly once change the allele counts
+        multiplicities = np.bincount(indices, minlength=len(self.bits)) - 1
+        changed = np.flatnonzero(multiplicities)
+        ones = self.ones + multiplicities[changed] @ bit_matrix.unpack(self.bits[changed], self.length)
+        self.set_bits(self.bits[indices], ids=self.ids[indices], fitnesses=self.fitnesses[indices],
+                      ones=ones, fingerprints=self.fingerprints[indices])
+        self.parents = indices
+
+    @staticmethod
+    def from_bits(fitness_function, bits, ids=None, fitnesses=None, ones=None, fingerprints=None):
+        """
+        Create a population from a packed bit matrix, see set_bits
+        """
+        population = Population.__new__(Population)
+        population.fitness_function = fitness_function
+        population.length = fitness_function.chr_length
+        population.set_bits(bits, ids=ids, fitnesses=fitnesses, ones=ones, fingerprints=fingerprints)
+        return population
 
-    def update_chromosomes(self, chromosomes):
-        self.chromosomes = chromosomes
-        self.update()
-    
     def __deepcopy__(self, memo):
-        return Population(self.fitness_function, chromosomes=deepcopy(self.chromosomes))
+        return Population.from_bits(self.fitness_function, self.bits.copy(), ids=self.ids.copy(),
+                                    fitnesses=self.fitnesses.copy(), ones=self.ones.copy(),
+                                    fingerprints=self.fingerprints.copy())
+
+    def __getstate__(self):
+        # the unpacked genotypes and chromosome views are rebuilt on demand
+        state = self.__dict__.copy()
+        state['_genotypes'] = None
+        state['_chromosomes'] = None
+        return state
     
     def __str__(self):
         return str(np.array([str(chr) for chr in self.chromosomes]))
@@ -138,14 +242,14 @@ if __name__ == '__main__':
     for i in range(0, N):
         print(f"Chromosome[{i}] = {pop.chromosomes[i]}")
 
-    fh = FH(2, BinaryEncoder(2))
-    pop = Population(fitness_function=fh, chromosomes=np.array([
-        Chromosome(0, np.array([b'0', b'1']), fh),
-        Chromosome(1, np.array([b'0', b'0']), fh),
-        Chromosome(2, np.array([b'0', b'0']), fh),
-        Chromosome(3, np.array([b'0', b'1']), fh)
+    fh = FH(BinaryEncoder(2))
+    pop = Population(fitness_function=fh, genotypes=np.array([
+        [0, 1],
+        [0, 0],
+        [0, 0],
+        [0, 1]
     ]))
     print(f'There are {pop.get_unique_X()} different chromosomes in the population')
 
-    pop = Population(fitness_function=fh, chromosomes=np.array([]))
+    pop = Population(fitness_function=fh, genotypes=np.empty((0, 2)))
     print(f'There are {pop.get_unique_X()} different chromosomes in the population')
@@ -0,0 +1,135 @@
+import numpy as np
+from config import N
+from model import bit_matrix
+from model.population import Population
+from model.convergence import ConvergenceChecks
+
+
+class PopulationBatch(ConvergenceChecks):
+    """
+    Populations of several runs of an experiment evolved in lockstep. The genotypes of all of them
+    form one packed (R, N, ceil(L/8)) uint8 bit tensor, next to (R, N) fitness, id and fingerprint
+    matrices, so every step of the algorithm is done for all runs at once.
+    The methods mirror the ones of Population and return a vector with an entry per population
+    """
+    def __init__(self, populations: list[Population]):
+        self.fitness_function = populations[0].fitness_function
+        self.length = self.fitness_function.chr_length
+        self.bits = np.stack([population.bits for population in populations])
+        self.ids = np.stack([population.ids for population in populations])
+        self.fitnesses = np.stack([population.fitnesses for population in populations])
+        self.fingerprints = np.stack([population.fingerprints for population in populations])
+        self.parents = None
+
+    def __len__(self):
+        return len(self.bits)
+
+    def keep(self, mask):
+        """
+        Keep only the populations selected by a boolean mask, e.g. the runs that have not finished yet
+        """
+        self.bits = self.bits[mask]
+        self.ids = self.ids[mask]
+        self.fitnesses = self.fitnesses[mask]
+        self.fingerprints = self.fingerprints[mask]
+        self.parents = None if self.parents is None else self.parents[mask]
+
+    def genotypes(self):
+        """
+        :return: (R, N, L) tensor of 0/1 genes
+        """
+        return bit_matrix.unpack(self.bits, self.length)
+
+    def is_homogeneous_frac(self, frac):
+        """
+        See Population.is_homogeneous_frac
+        """
+        percentages = (N - np.count_nonzero(self.genotypes(), axis=1)) / N
+        return ~np.any((percentages > (1 - frac)) & (percentages < frac), axis=1)
+
+    def is_homogenous_100(self):
+        return np.all(self.fingerprints == self.fingerprints[:, :1], axis=1)
+
+    def found_close_to_optimal(self):
+        genotypes = self.genotypes().reshape(-1, self.length)
+        is_successful = self.fitness_function.check_success_batch(genotypes, self.fitnesses.ravel())
+        return np.any(np.reshape(is_successful, self.fitnesses.shape), axis=1)
+
+    def get_fitness_max(self):
+        return np.max(self.fitnesses, axis=1)
+
+    def get_fitness_avg(self):
+        return np.mean(self.fitnesses, axis=1)
+
+    def get_fitness_std(self):
+        return np.std(self.fitnesses, axis=1)
+
+    def count_fitness_at_least(self, min_fitnesses):
+        """
+        :param min_fitnesses: threshold of every population
+        """
+        return np.count_nonzero(self.fitnesses >= min_fitnesses[:, np.newaxis], axis=1)
+
+    def count_optimal_genotype(self):
+        optimal = bit_matrix.pack(self.fitness_function.get_optimal().genotype)
+        return np.count_nonzero(self.fingerprints == bit_matrix.fingerprints(optimal[np.newaxis])[0], axis=1)
+
+    def get_unique_X(self):
+        """
+        Find the number of different chromosomes in every population
+        """
+        fingerprints = np.sort(self.fingerprints, axis=1)
+        return 1 + np.count_nonzero(fingerprints[:, 1:] != fingerprints[:, :-1], axis=1)
+
+    def set_bits(self, bits, ids=None, fitnesses=None, fingerprints=None):
+        """
+        Replace the chromosomes of all populations, see Population.set_bits
+        """
+        self.bits = bits
+        self.ids = np.broadcast_to(np.arange(bits.shape[1]), bits.shape[:2]) if ids is None else ids
+        self.fingerprints = self.__fingerprints(bits) if fingerprints is None else fingerprints
+        self.parents = None
+        if fitnesses is None:
+            fitnesses = self.fitness_function.apply_batch(self.genotypes().reshape(-1, self.length))
+            fitnesses = np.reshape(fitnesses, bits.shape[:2])
+        self.fitnesses = np.asarray(fitnesses, dtype=np.float64)
+
+    def flip_genes(self, runs, rows, cols):
+        """
+        Flip single genes and re-evaluate the chromosomes that changed
+        :param runs: population index of every flipped gene
+        :param rows: chromosome index of every flipped gene
+        :param cols: locus of every flipped gene
+        """
+        bits = self.bits.copy()
+        bit_matrix.flip(bits.reshape(-1, bits.shape[2]), runs * N + rows, cols)
+        self.set_bits(bits, ids=self.ids, fitnesses=self.fitnesses.copy(), fingerprints=self.fingerprints.copy())
+        changed = np.unique(runs * N + rows)
+        self.refresh(changed // N, changed % N)
+
+    def refresh(self, runs, rows):
+        """
+        Re-evaluate the fitnesses and fingerprints of the chromosomes whose genes were changed in place
+        :param runs: population index of every changed chromosome
+        :param rows: chromosome index of every changed chromosome
+        """
+        if len(rows) > 0:
+            bits = self.bits[runs, rows]
+            self.fitnesses[runs, rows] = self.fitness_function.apply_batch(bit_matrix.unpack(bits, self.length))
+            self.fingerprints[runs, rows] = bit_matrix.fingerprints(bits)
+
+    def reset_ids(self):
+        self.ids = np.broadcast_to(np.arange(self.bits.shape[1]), self.bits.shape[:2])
+
+    def select(self, indices):
+        """
+        Replace every population with the chromosomes at its row of indices, see Population.select
+        :param indices: (R, N) matrix of the mating pools
+        """
+        runs = np.arange(len(self.bits))[:, np.newaxis]
+        self.set_bits(self.bits[runs, indices], ids=self.ids[runs, indices],
+                      fitnesses=self.fitnesses[runs, indices], fingerprints=self.fingerprints[runs, indices])
+        self.parents = indices
+
+    def __fingerprints(self, bits):
+        return np.reshape(bit_matrix.fingerprints(bits.reshape(-1, bits.shape[2])), bits.shape[:2])
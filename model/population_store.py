@@ -0,0 +1,82 @@
+import numpy as np
+import os
+import tempfile
+import weakref
+from config import N, NR
+from model.fitness_cache import TABLE_DIR
+from model.population import Population
+
+
+class PopulationStore:
+    """
+    Initial populations of all runs of a fitness function, generated once into a
+    (init_modes, NR, N) tensor of chromosomes (packed genotype, id and fitness) in a memory-mapped file.
+    Pickled copies only carry the file path, so a worker maps the tensor by name and copies
+    the slice of its run instead of receiving a pickled population
+    """
+    def __init__(self, fitness_function, population_inits):
+        """
+        :param population_inits: n_optimal parameter of every initialization mode
+        """
+        self.fitness_function = fitness_function
+        self.population_inits = list(population_inits)
+        n_bytes = -(-fitness_function.chr_length // 8)
+        dtype = np.dtype([('bits', np.uint8, (n_bytes,)), ('id', np.int64), ('fitness', np.float64)])
+
+        fd, self.path = tempfile.mkstemp(prefix='populations_', suffix='.npy', dir=TABLE_DIR)
+        os.close(fd)
+        weakref.finalize(self, PopulationStore.__remove, self.path, os.getpid())
+
+        chromosomes = np.lib.format.open_memmap(self.path, mode='w+', dtype=dtype,
+                                                shape=(len(self.population_inits), NR, N))
+        for init_i, n_optimal in enumerate(self.population_inits):
+            for run_i in range(NR):
+                population = fitness_function.generate_population_for_run(run_i, n_optimal=n_optimal)
+                chromosomes['bits'][init_i, run_i] = population.bits
+                chromosomes['id'][init_i, run_i] = population.ids
+                chromosomes['fitness'][init_i, run_i] = population.fitnesses
+        chromosomes.flush()
+        del chromosomes
+        self.chromosomes = np.load(self.path, mmap_mode='r')
+
+    def runs(self, population_init):
+        """
+        :return: references to the initial populations of all runs for an initialization mode
+        """
+        init_i = self.population_inits.index(population_init)
+        return [SharedPopulation(self, init_i, run_i) for run_i in range(NR)]
+
+    def load(self, init_i, run_i):
+        """
+        :return: a new population with a copy of the chromosomes of a run
+        """
+        chromosomes = np.array(self.chromosomes[init_i, run_i])
+        return Population.from_bits(self.fitness_function, chromosomes['bits'],
+                                    ids=chromosomes['id'], fitnesses=chromosomes['fitness'])
+
+    def __getstate__(self):
+        return {'fitness_function': self.fitness_function, 'population_inits': self.population_inits,
+                'path': self.path}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.chromosomes = np.load(self.path, mmap_mode='r')
+
+    @staticmethod
+    def __remove(path, owner_pid):
+        # workers only map the file, it belongs to the process that generated the populations
+        if os.getpid() == owner_pid and os.path.exists(path):
+            os.remove(path)
+
+
+class SharedPopulation:
+    """
+    Reference to the initial population of a run in a PopulationStore
+    """
+    def __init__(self, store: PopulationStore, init_i, run_i):
+        self.store = store
+        self.init_i = init_i
+        self.run_i = run_i
+
+    def load(self):
+        return self.store.load(self.init_i, self.run_i)
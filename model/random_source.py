@@ -0,0 +1,84 @@
+from config import get_pop_seed, RANDOM_BLOCK_SIZE
+import numpy as np
+
+
+class RandomSource:
+    """
+    Random numbers of a run, drawn from its own generator seeded by a SeedSequence spawned from the seed
+    of its initial population, so a run draws the same numbers whichever process runs it and whichever
+    runs are evolved next to it. The numbers are handed out from large blocks drawn at once, which saves
+    a generator call for every few numbers. The methods mirror the ones of np.random.Generator
+    """
+    def __init__(self, run_i, block_size=RANDOM_BLOCK_SIZE):
+        self.generator = np.random.default_rng(np.random.SeedSequence(get_pop_seed(run_i)).spawn(1)[0])
+        self.block_size = block_size
+        self.uniforms = np.empty(0)
+        self.next_uniform = 0
+        # block of permutations and the index of the next one, for every permuted length
+        self.permutations = {}
+
+    def random(self, size=None):
+        """
+        :return: uniform numbers in [0, 1)
+        """
+        if size is None:
+            return float(self.__take(1)[0])
+        return np.reshape(self.__take(int(np.prod(size))), size)
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        if size is None:
+            size = np.broadcast(low, high).shape or None
+        return low + (high - low) * self.random(size)
+
+    def integers(self, low, high=None, size=None):
+        """
+        :return: integers in [low, high), or in [0, low) if high is not given
+        """
+        if high is None:
+            low, high = 0, low
+        if size is None:
+            size = np.broadcast(low, high).shape or None
+        span = np.asarray(high) - np.asarray(low)
+        # rounding can push the product of a number close to 1 up to the span itself
+        offsets = np.minimum(np.floor(self.random(size) * span).astype(np.int64), span - 1)
+        return low + offsets if size is not None else int(low + offsets)
+
+    def geometric(self, p, size=None):
+        """
+        :return: numbers of Bernoulli(p) trials up to the first success, inverted from uniform numbers
+        """
+        trials = np.floor(np.log1p(-self.random(size)) / np.log1p(-p)).astype(np.int64) + 1
+        return trials if size is not None else int(trials)
+
+    def permutation(self, n):
+        block, next_permutation = self.permutations.get(n, (None, 0))
+        if block is None or next_permutation == len(block):
+            count = max(1, self.block_size // n)
+            block = self.generator.permuted(np.broadcast_to(np.arange(n), (count, n)), axis=1)
+            next_permutation = 0
+        self.permutations[n] = (block, next_permutation + 1)
+        return block[next_permutation]
+
+    def choice(self, n, size=None, p=None):
+        """
+        :return: indices in [0, n) drawn with replacement with probabilities p, uniformly if not given
+        """
+        if p is None:
+            return self.integers(0, n, size)
+        cumulative = np.cumsum(p)
+        indices = np.searchsorted(cumulative / cumulative[-1], self.random(size), side='right')
+        return np.minimum(indices, n - 1)
+
+    def __take(self, count):
+        """
+        :return: the next count uniform numbers of the blocks
+        """
+        end = self.next_uniform + count
+        if end <= len(self.uniforms):
+            self.next_uniform = end
+            return self.uniforms[end - count:end]
+
+        left = self.uniforms[self.next_uniform:]
+        self.uniforms = self.generator.random(max(self.block_size, count - len(left)))
+        self.next_uniform = count - len(left)
+        return np.concatenate([left, self.uniforms[:self.next_uniform]])
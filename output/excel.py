@@ -202,7 +202,7 @@ def write_population_stats(population: Population, param_names, run_i, gen_i, ho
     worksheet.write(0, 3, '#individuals')
 
     def hash_numpy(geno):
-        hash = ''.join(str(b.decode('utf-8')) for b in geno)
+        hash = ''.join(str(gene) for gene in geno)
         return hash
     
     genotypes = {}
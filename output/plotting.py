@@ -165,7 +165,7 @@ def __plot_phenotype_distribution(
     if not os.path.exists(path):
         os.makedirs(path)
 
-    phenotypes = [population.fitness_function.get_phenotype(geno) for geno in population.genotypes]
+    phenotypes = population.fitness_function.get_phenotype_batch(population.genotypes)
     encoder = population.fitness_function.encoder
     x_min = encoder.lower_bound
     x_max = encoder.upper_bound
@@ -191,7 +191,7 @@ def __plot_genotype_distribution(
     if not os.path.exists(path):
         os.makedirs(path)
 
-    ones_counts = [len([True for gene in geno if gene == b'1']) for geno in population.genotypes]
+    ones_counts = np.count_nonzero(population.genotypes, axis=1)
     (x, y) = __get_distribution(ones_counts, x_max=population.fitness_function.chr_length)
     plt.bar(x, y)
     plt.xlabel('Number of 1s in genotype')
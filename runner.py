@@ -1,56 +1,182 @@
 from multiprocess import Pool
 import gc
-from config import NR, THREADS
-from stats.experiment_stats import ExperimentStats
+from config import N, G, NR, THREADS, RUNS_TO_PLOT, LOCKSTEP_RUNS, ANALYTIC_EXPERIMENTS
+from stats.experiment_stats import ExperimentStats, AnalyticExperimentStats
+from stats.markov_chain import TakeoverChain, LineageChain
 from evo_algorithm import EvoAlgorithm
+from lockstep_algorithm import LockstepAlgorithm, BATCH_SELECTION_METHODS
 from model.population import Population
+from model.population_store import SharedPopulation
 from selection.selection_method import SelectionMethod
-from model.gen_operators import GeneticOperator
+from model.gen_operators import GeneticOperator, BlankGenOperator
 from selection.rws import *
-from copy import deepcopy
+from copy import copy, deepcopy
 from datetime import datetime
+import numpy as np
 
 def run_experiment(selection_method: SelectionMethod,
                    genetic_operator: GeneticOperator,
                    population_init,
                    param_names: tuple[str],
-                   populations: list[Population]):
-    stats = ExperimentStats(param_names)
+                   populations: list[Population | SharedPopulation],
+                   pool: Pool = None):
+    """
+    :param pool: worker pool shared between experiments, a pool for this experiment is created if not given.
+                 Every run is a separate task, so a worker starts the next run as soon as it is free
+    """
+    if pool is None:
+        with Pool(min(THREADS, NR)) as p:
+            return run_experiment(selection_method, genetic_operator, population_init, param_names, populations, p)
 
-    run_param_list = [
-        (populations[run_i],
+    experiment = (selection_method, genetic_operator, population_init, param_names, populations)
+    for _, stats in run_experiments([experiment], pool):
+        return stats
+
+def run_experiments(experiments: list[tuple], pool: Pool):
+    """
+    Run all runs of several experiments as one queue of tasks, the longest expected tasks first.
+    A task is either a single run or a group of runs evolved in lockstep. With ANALYTIC_EXPERIMENTS
+    the experiments that can be solved exactly are not run, see solve_experiment
+    :param experiments: tuples of run_experiment parameters (without the pool)
+    :return: generator of (experiment index, ExperimentStats), yielded as soon as the last run of an experiment is in
+    """
+    solved = [exp_i for exp_i, (selection_method, genetic_operator, _, param_names, _) in enumerate(experiments)
+              if ANALYTIC_EXPERIMENTS and is_solvable(selection_method, genetic_operator, param_names)]
+    stats_list = [ExperimentStats(experiment[3]) for experiment in experiments]
+    runs_left = [NR] * len(experiments)
+
+    tasks = [
+        (exp_i,
+         [populations[run_i] for run_i in run_indices],
          selection_method,
          genetic_operator,
          population_init,
          param_names,
-         run_i
+         run_indices
         )
-        for run_i in range(NR)
+        for exp_i, (selection_method, genetic_operator, population_init, param_names, populations) in enumerate(experiments)
+        if exp_i not in solved
+        for run_indices in group_runs(selection_method, genetic_operator)
     ]
+    tasks.sort(key=lambda task: sum(expected_run_cost(task[3], run_i) for run_i in task[6]), reverse=True)
+
+    results = pool.imap_unordered(run_task, tasks)
+    for exp_i in solved:
+        stats_list[exp_i] = None
+        yield exp_i, solve_experiment(*experiments[exp_i])
+
+    for exp_i, runs in results:
+        stats = stats_list[exp_i]
+        for run_i, run_stats in runs:
+            stats.add_run(run_stats, run_i)
+        runs_left[exp_i] -= len(runs)
+        if runs_left[exp_i] == 0:
+            stats.calculate()
+            stats_list[exp_i] = None
+            print(f'{str(datetime.now())[:-4]} | Experiment ({"|".join(stats.params)}) finished')
+            gc.collect()
+            yield exp_i, stats
+
+def is_solvable(selection_method: SelectionMethod, genetic_operator: GeneticOperator, param_names: tuple[str]):
+    """
+    Whether the stats of an experiment can be computed by solve_experiment: selection alone
+    on a fitness function with a single optimal chromosome, by a method whose choice only depends
+    on the current fitnesses
+    """
+    return param_names[0] in ('FconstALL', 'FH', 'FHD') and issubclass(genetic_operator, BlankGenOperator) \
+        and type(selection_method) in BATCH_SELECTION_METHODS
+
+def solve_experiment(selection_method: SelectionMethod,
+                     genetic_operator: GeneticOperator,
+                     population_init,
+                     param_names: tuple[str],
+                     populations: list[Population | SharedPopulation]):
+    """
+    Analytic counterpart of run_experiment for the experiments is_solvable accepts: instead of running
+    the populations, the distributions of the runs are computed from a Markov chain.
+    For FconstALL a run succeeds when its population is homogeneous, which follows from the number of
+    its ancestors in the initial population (see LineageChain). For FH and FHD it follows from the number
+    of optimal chromosomes (see TakeoverChain), with the non-optimal chromosomes at their mean initial fitness
+    :return: AnalyticExperimentStats
+    """
+    populations = [population.load() if isinstance(population, SharedPopulation) else population
+                   for population in populations]
+    n_optimal = np.array([population.count_optimal_genotype() for population in populations])
+    stats = AnalyticExperimentStats(param_names)
 
-    for i in range(NR // THREADS):
-        with Pool(THREADS) as p:
-            results = p.starmap(run, run_param_list[(i * THREADS):((i+1) * THREADS)])
-            for run_i, run_stats in results:
-                stats.add_run(run_stats, run_i)
-    if NR % THREADS:
-        with Pool(NR % THREADS) as p:
-            results = p.starmap(run, run_param_list[-(NR % THREADS):])
-            for run_i, run_stats in results:
-                stats.add_run(run_stats, run_i)
-    
-    stats.calculate()
-    print(f'{str(datetime.now())[:-4]} | Experiment ({"|".join(param_names)}) finished')
-    gc.collect()
+    if param_names[0] == 'FconstALL':
+        homogeneous = np.mean([LineageChain.homogeneous_probabilities(n) for n in n_optimal], axis=0)
+        stats.calculate(LineageChain(selection_method).homogeneity_times(homogeneous, G))
+    else:
+        f_optimal = populations[0].fitness_function.get_optimal().fitness
+        f_other = np.mean(np.concatenate([population.fitnesses[population.fitnesses != f_optimal]
+                                          for population in populations]))
+        start = np.bincount(n_optimal, minlength=N + 1) / len(populations)
+        stats.calculate(*TakeoverChain(selection_method, f_optimal, f_other).hitting_times(start, G))
+
+    print(f'{str(datetime.now())[:-4]} | Experiment ({"|".join(param_names)}) solved')
     return stats
 
+def expected_run_cost(genetic_operator: GeneticOperator, run_i: int):
+    """
+    Rough relative cost of a run, used to start the longest runs first. With genetic operators a run
+    usually lasts until the generation limit, while selection alone takes over the population in about
+    O(N) generations. The runs that are plotted also pay for the plots
+    """
+    generations = min(G, 10 * N) if issubclass(genetic_operator, BlankGenOperator) else G
+    if run_i < RUNS_TO_PLOT:
+        generations *= 2
+    return generations
+
+def group_runs(selection_method: SelectionMethod, genetic_operator: GeneticOperator):
+    """
+    Split the runs of an experiment into tasks. The runs that are plotted are separate tasks,
+    the other ones are evolved in lockstep in groups of LOCKSTEP_RUNS if the experiment supports it
+    :return: list of the run indices of every task
+    """
+    if LOCKSTEP_RUNS <= 1 or not LockstepAlgorithm.supports(selection_method, genetic_operator):
+        return [[run_i] for run_i in range(NR)]
+    plotted = [[run_i] for run_i in range(min(RUNS_TO_PLOT, NR))]
+    return plotted + [list(range(start, min(start + LOCKSTEP_RUNS, NR)))
+                      for start in range(len(plotted), NR, LOCKSTEP_RUNS)]
+
+def run_task(task):
+    exp_i, populations, selection_method, genetic_operator, population_init, param_names, run_indices = task
+    if len(run_indices) == 1:
+        return (exp_i, [run(populations[0], selection_method, genetic_operator, population_init,
+                            param_names, run_indices[0])])
+    return (exp_i, run_lockstep(populations, selection_method, genetic_operator, population_init,
+                                param_names, run_indices))
+
 def run(init_population: Population,
         selection_method: SelectionMethod,
         genetic_operator: GeneticOperator,
         population_init,
         param_names: tuple[str],
         run_i: int):
+    """
+    :param init_population: initial population, or a reference to it in a PopulationStore
+    """
+    if isinstance(init_population, SharedPopulation):
+        population = init_population.load()
+    else:
+        population = deepcopy(init_population)
     sm_obj = copy(selection_method)
     # print(f'F_Min = {sm_obj.f_min}')
-    current_run = EvoAlgorithm(deepcopy(init_population), sm_obj, genetic_operator, population_init, param_names).run(run_i)
-    return (run_i, current_run)
\ No newline at end of file
+    current_run = EvoAlgorithm(population, sm_obj, genetic_operator, population_init, param_names).run(run_i)
+    return (run_i, current_run)
+
+def run_lockstep(init_populations: list[Population | SharedPopulation],
+                 selection_method: SelectionMethod,
+                 genetic_operator: GeneticOperator,
+                 population_init,
+                 param_names: tuple[str],
+                 run_indices: list[int]):
+    """
+    Evolve several runs of an experiment together, see LockstepAlgorithm
+    :return: list of (run index, RunStats)
+    """
+    populations = [population.load() if isinstance(population, SharedPopulation) else population
+                   for population in init_populations]
+    return LockstepAlgorithm(populations, copy(selection_method), genetic_operator, population_init,
+                             param_names, run_indices).run()
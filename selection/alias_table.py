@@ -0,0 +1,40 @@
+import numpy as np
+
+
+class AliasTable:
+    """
+    Walker's alias table for drawing indices from a discrete distribution in O(1) per sample.
+    Building the table is O(n), so it pays off when the same distribution is sampled repeatedly
+    """
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        self.weights = weights.copy()
+        n = len(weights)
+        scaled = weights * n / np.sum(weights)
+        self.prob = np.ones(n)
+        self.alias = np.arange(n)
+
+        small = list(np.flatnonzero(scaled < 1))
+        large = list(np.flatnonzero(scaled >= 1))
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            if scaled[l] < 1:
+                small.append(l)
+            else:
+                large.append(l)
+        # whatever is left has probability 1 up to rounding errors
+
+    def matches(self, weights):
+        return np.array_equal(self.weights, weights)
+
+    def sample(self, size, rng):
+        """
+        :param rng: random source of the run
+        """
+        columns = rng.integers(0, len(self.prob), size=size)
+        keep = rng.random(size) < self.prob[columns]
+        return np.where(keep, columns, self.alias[columns])
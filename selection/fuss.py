@@ -2,7 +2,6 @@ from config import G, N
 import numpy as np
 from model.population import Population
 from selection.selection_method import SelectionMethod
-from copy import copy
 
 
 class FUSS(SelectionMethod):
@@ -11,7 +10,10 @@ class FUSS(SelectionMethod):
         self.f_min = None
         self.f_max = None
 
-    def select(self, population):
+    def choose(self, population: Population, rng):
+        """
+        :return: indices of the N chromosomes chosen for the mating pool
+        """
         fitness_max = population.get_fitness_max()
         fitness_min = population.get_fitness_min()
 
@@ -20,35 +22,33 @@ class FUSS(SelectionMethod):
         if self.f_max is None or self.f_max < fitness_max:
             self.f_max = fitness_max
         
-        chosen = []
-        for i in range(N):
-            x = np.random.uniform(self.f_min, self.f_max)
-            ind = self.__find_closest(population.fitnesses, x)
-            chosen.append(population.chromosomes[ind])
-
-        mating_pool = np.array([copy(chr) for chr in chosen])
-        population.update_chromosomes(mating_pool)
+        targets = rng.uniform(self.f_min, self.f_max, N)
+        return self.__find_closest(population.fitnesses, targets, rng)
 
     @staticmethod
-    def __find_closest(arr, x):
+    def __find_closest(arr, xs, rng):
         """
-        Findest the closest value to x in array arr.
+        For every x in xs find the index of the closest value in array arr.
         In case of ties, pick a random one
         """
-        # Calculate absolute difference between each element and x
-        diffs = np.abs(arr - x)
-        
-        # Find the minimum difference
-        min_diff = np.min(diffs)
-        
-        # Create a boolean mask for elements with minimum difference
-        mask = diffs == min_diff
-        
-        # Get the indices of the True values in the mask
-        closest_indices = np.flatnonzero(mask)
-        
-        # Randomly choose one of the indices
-        chosen_index = np.random.choice(closest_indices)
-        
-        # Return the corresponding element from arr
-        return chosen_index
\ No newline at end of file
+        order = np.argsort(arr, kind='stable')
+        sorted_arr = arr[order]
+
+        # the closest value is one of the neighbours of the insertion point
+        positions = np.searchsorted(sorted_arr, xs)
+        left = np.maximum(positions - 1, 0)
+        right = np.minimum(positions, len(arr) - 1)
+        left_diffs = np.abs(sorted_arr[left] - xs)
+        right_diffs = np.abs(sorted_arr[right] - xs)
+
+        # the tied indices form a run of the sorted array, which may span
+        # the values on both sides when they are equally close
+        lows = np.where(left_diffs <= right_diffs,
+                        np.searchsorted(sorted_arr, sorted_arr[left], side='left'),
+                        np.searchsorted(sorted_arr, sorted_arr[right], side='left'))
+        highs = np.where(right_diffs <= left_diffs,
+                         np.searchsorted(sorted_arr, sorted_arr[right], side='right'),
+                         np.searchsorted(sorted_arr, sorted_arr[left], side='right'))
+
+        # randomly choose one of the tied indices
+        return order[rng.integers(lows, highs)]
@@ -2,66 +2,94 @@ from config import G, N
 import numpy as np
 from model.population import Population
 from selection.selection_method import SelectionMethod
-from copy import copy
+from selection.alias_table import AliasTable
 
 
 class RWS(SelectionMethod):
-    def select(self, population):
-        fitness_list = population.fitnesses
-        fitness_sum = sum(fitness_list)
+    """
+    Roulette wheel selection, the probability to be chosen is proportional to the scaled fitness.
+    The variants below only differ in how the fitnesses are scaled
+    """
+    def __init__(self, use_alias=False):
+        """
+        :param use_alias: sample with a Walker alias table, which is reused while the
+                          scaled fitnesses stay the same
+        """
+        self.use_alias = use_alias
+        self.alias_table = None
+
+    def choose(self, population: Population, rng):
+        """
+        :return: indices of the N chromosomes chosen for the mating pool
+        """
+        f_scaled = self.scale(population)
+        fitness_sum = np.sum(f_scaled)
 
         if fitness_sum == 0:
-            fitness_list = [0.0001 for _ in fitness_list]
+            f_scaled = np.full(N, 0.0001)
             fitness_sum = 0.0001 * N
 
-        probabilities = [fitness/fitness_sum for fitness in fitness_list]
-        chosen = np.random.choice(population.chromosomes, size=N, p=probabilities)
-        mating_pool = np.array([copy(chr) for chr in chosen])
-        population.update_chromosomes(mating_pool)
+        if self.use_alias:
+            if self.alias_table is None or not self.alias_table.matches(f_scaled):
+                self.alias_table = AliasTable(f_scaled)
+            return self.alias_table.sample(N, rng)
 
+        return rng.choice(N, size=N, p=f_scaled / fitness_sum)
 
-class DisruptiveRWS(SelectionMethod):
-    def select(self, population):
-        f_avg = population.get_fitness_avg()
-        f_scaled = [abs(fitness - f_avg) for fitness in population.fitnesses]
-        fitness_sum = sum(f_scaled)
+    def scale(self, population: Population):
+        return population.fitnesses
 
-        if fitness_sum == 0:
-            f_scaled = [0.0001 for _ in f_scaled]
-            fitness_sum = 0.0001 * N
+    def choose_batch(self, fitnesses, rngs):
+        f_scaled = self.scale_batch(fitnesses)
+        fitness_sums = np.sum(f_scaled, axis=1)
+        f_scaled[fitness_sums == 0] = 0.0001
 
-        probabilities = [fitness/fitness_sum for fitness in f_scaled]
-        chosen = np.random.choice(population.chromosomes, size=N, p=probabilities)
-        mating_pool = np.array([copy(chr) for chr in chosen])
-        population.update_chromosomes(mating_pool)
+        # every row of the cumulative probabilities is shifted by its index, so that one search
+        # over the flattened matrix finds the chosen chromosomes of all populations
+        shifts = np.arange(len(f_scaled))[:, np.newaxis]
+        cumulative = np.cumsum(f_scaled, axis=1)
+        cumulative = cumulative / cumulative[:, -1:] + shifts
+        targets = np.stack([rng.random(N) for rng in rngs]) + shifts
+        indices = np.searchsorted(cumulative.ravel(), targets.ravel(), side='right').reshape(targets.shape)
+        return np.minimum(indices - shifts * N, N - 1)
 
+    def scale_batch(self, fitnesses):
+        """
+        Scale the fitnesses of all populations of a lockstep batch, see scale
+        :return: (R, N) matrix of scaled fitnesses
+        """
+        return fitnesses.copy()
 
-class BlendedRWS(SelectionMethod):
-    def __init__(self):
-        self.i = 0
 
-    def select(self, population):
-        f_scaled = [fitness / (G + 1 - self.i) for fitness in population.fitnesses]
-        fitness_sum = sum(f_scaled)
+class DisruptiveRWS(RWS):
+    def scale(self, population):
+        f_avg = population.get_fitness_avg()
+        return np.abs(population.fitnesses - f_avg)
 
-        if fitness_sum == 0:
-            f_scaled = [0.0001 for _ in f_scaled]
-            fitness_sum = 0.0001 * N
+    def scale_batch(self, fitnesses):
+        return np.abs(fitnesses - np.mean(fitnesses, axis=1, keepdims=True))
 
-        probabilities = [fitness/fitness_sum for fitness in f_scaled]
-        chosen = np.random.choice(population.chromosomes, size=N, p=probabilities)
-        mating_pool = np.array([copy(chr) for chr in chosen])
-        population.update_chromosomes(mating_pool)
 
+class BlendedRWS(RWS):
+    def __init__(self, use_alias=False):
+        super().__init__(use_alias)
+        self.i = 0
+
+    def select(self, population, rng):
+        super().select(population, rng)
         self.i += 1
 
+    def scale(self, population):
+        return population.fitnesses / (G + 1 - self.i)
 
-class WindowRWS(SelectionMethod):
-    def __init__(self, h=2):
+
+class WindowRWS(RWS):
+    def __init__(self, h=2, use_alias=False):
+        super().__init__(use_alias)
         self.h = h
         self.f_h_worst = []
 
-    def select(self, population):
+    def scale(self, population):
         if len(self.f_h_worst) < self.h:
             self.f_h_worst.append(min(population.fitnesses))
         else:
@@ -69,40 +97,19 @@ class WindowRWS(SelectionMethod):
             self.f_h_worst[1] = min(population.fitnesses)
         f_worst = min(self.f_h_worst)
 
-        f_scaled = [fitness - f_worst for fitness in population.fitnesses]
-        fitness_sum = sum(f_scaled)
-
-        if fitness_sum == 0:
-            f_scaled = [0.0001 for _ in f_scaled]
-            fitness_sum = 0.0001 * N
-
-        probabilities = [fitness/fitness_sum for fitness in f_scaled]
-        chosen = np.random.choice(population.chromosomes, size=N, p=probabilities)
-        mating_pool = np.array([copy(chr) for chr in chosen])
-        population.update_chromosomes(mating_pool)
+        return population.fitnesses - f_worst
 
 
-class ScaledRWS(SelectionMethod):
+class ScaledRWS(RWS):
 
-    def __init__(self, scale: float, bias: callable):
+    def __init__(self, scale: float, bias: callable, use_alias=False):
+        super().__init__(use_alias)
         self.a = scale
         self.b = bias
 
-    def select(self, population: Population):
+    def scale(self, population: Population):
         bias = self.b(population.fitnesses)
-        fitness_list = [self.a*fitness + bias for fitness in population.fitnesses]
-        
-        fitness_list = [np.maximum(0, fitness) for fitness in fitness_list]
-        if np.all(np.array(fitness_list) == 0):
-            fitness_list = [0.0001 for _ in fitness_list]
-        
-        fitness_sum = sum(fitness_list)
-
-        if fitness_sum == 0:
-            fitness_list = [0.0001 for _ in fitness_list]
-            fitness_sum = 0.0001 * N
-
-        probabilities = [fitness/fitness_sum for fitness in fitness_list]
-        chosen = np.random.choice(population.chromosomes, size=N, p=probabilities)
-        mating_pool = np.array([copy(chr) for chr in chosen])
-        population.update_chromosomes(mating_pool)
+        f_scaled = np.maximum(0, self.a*population.fitnesses + bias)
+        if np.all(f_scaled == 0):
+            f_scaled = np.full(N, 0.0001)
+        return f_scaled
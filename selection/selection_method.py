@@ -1,5 +1,49 @@
+import numpy as np
 from model.population import Population
+from model.random_source import RandomSource
 
 class SelectionMethod:
-    def select(self, population: Population) -> None:
-        raise NotImplementedError()
\ No newline at end of file
+    def select(self, population: Population, rng: RandomSource) -> None:
+        """
+        Replace the population with its mating pool. The pool is a vector of indices,
+        so the chosen chromosomes are gathered without copying or re-evaluating them
+        :param rng: random source of the run
+        """
+        population.select(self.choose(population, rng))
+
+    def choose(self, population: Population, rng: RandomSource):
+        """
+        :param rng: random source of the run
+        :return: indices of the N chromosomes chosen for the mating pool
+        """
+        raise NotImplementedError()
+
+    def choose_batch(self, fitnesses, rngs):
+        """
+        Choose the mating pools of the populations of a lockstep batch (see model/population_batch.py)
+        :param fitnesses: (R, N) matrix of the fitnesses of every population
+        :param rngs: random source of every population
+        :return: (R, N) matrix of the indices chosen for every mating pool
+        """
+        raise NotImplementedError()
+
+    def is_identity(self, population: Population) -> bool:
+        """
+        Whether the mating pool is the population itself in the same order, whatever the random draws,
+        so that selection leaves the population as it is
+        """
+        return False
+
+    def is_identity_batch(self, fitnesses):
+        """
+        See is_identity, for the populations of a lockstep batch
+        :param fitnesses: (R, N) matrix of the fitnesses of every population
+        :return: boolean vector with an entry per population
+        """
+        return np.zeros(len(fitnesses), dtype=bool)
+
+    def skip(self, generations):
+        """
+        Account for generations that were skipped because selection left the population as it is
+        """
+        pass
@@ -2,101 +2,104 @@ from config import G, N
 from model.population import Population
 import numpy as np
 from selection.selection_method import SelectionMethod
-from copy import copy
 
 
 class SUS(SelectionMethod):
-    def select(self, population: Population):
-        fitness_sum = 0
-        fitness_scale = []
-
-        for index, chromosome in enumerate(population.chromosomes):
-            fitness_sum += chromosome.fitness
-            if index == 0:
-                fitness_scale.append(chromosome.fitness)
-            else:
-                fitness_scale.append(chromosome.fitness + fitness_scale[index - 1])
+    """
+    Stochastic universal sampling: N equally spaced pointers over the cumulative scaled fitness.
+    The variants below only differ in how the fitnesses are scaled
+    """
+    def choose(self, population: Population, rng):
+        """
+        :return: indices of the N chromosomes chosen for the mating pool
+        """
+        return SUS.basic_sus(self.scale(population), rng)
+
+    def scale(self, population: Population):
+        return population.fitnesses
+
+    def is_identity(self, population: Population):
+        # equal fitnesses are scaled equally, and equally spaced pointers hit every chromosome once
+        return bool(np.all(population.fitnesses == population.fitnesses[0]))
+
+    def is_identity_batch(self, fitnesses):
+        return np.all(fitnesses == fitnesses[:, :1], axis=1)
+    
+    @staticmethod
+    def basic_sus(f_scaled, rng):
+        """
+        :param f_scaled: vector of non-negative scaled fitnesses
+        :param rng: random source of the run
+        :return: indices of the chromosomes hit by the pointers
+        """
+        fitness_scale = np.cumsum(f_scaled)
+        fitness_sum = fitness_scale[-1]
 
         if fitness_sum == 0:
             fitness_sum = 0.0001 * N
-            fitness_scale = [0.0001 * (i+1) for i in range(N)]
+            fitness_scale = 0.0001 * np.arange(1, N + 1)
 
-        mating_pool = self.basic_sus(population, fitness_sum, fitness_scale)
-        population.update_chromosomes(mating_pool)
-    
-    @staticmethod
-    def basic_sus(population: Population, fitness_sum, fitness_scale):
-        mating_pool = np.empty(N, dtype=object)
         fitness_step = fitness_sum / N
-        random_offset = np.random.uniform(0, fitness_step)
-        current_fitness_pointer = random_offset
-        last_fitness_scale_position = 0
-
-        for i in range(N):
-            for fitness_scale_position in range(last_fitness_scale_position, len(fitness_scale)):
-                if fitness_scale[fitness_scale_position] >= current_fitness_pointer:
-                    mating_pool[i] = copy(population.chromosomes[fitness_scale_position])
-                    last_fitness_scale_position = fitness_scale_position
-                    break
-            current_fitness_pointer += fitness_step
-
-        return mating_pool
-
-
-class DisruptiveSUS(SelectionMethod):
-    def select(self, population: Population):
-        fitness_sum = 0
-        fitness_scale = []
+        random_offset = rng.uniform(0, fitness_step)
+        # accumulate the pointers step by step, the same way as the scale itself
+        pointers = np.cumsum(np.concatenate([[random_offset], np.full(N - 1, fitness_step)]))
+
+        # every pointer selects the first chromosome whose cumulative fitness reaches it
+        indices = np.searchsorted(np.maximum.accumulate(fitness_scale), pointers)
+        return np.minimum(indices, N - 1)
+
+    def choose_batch(self, fitnesses, rngs):
+        f_scaled = self.scale_batch(fitnesses)
+        f_scaled[np.sum(f_scaled, axis=1) == 0] = 0.0001
+
+        # the pointers and the cumulative fitness of every population are scaled to [0, 1] and
+        # shifted by the population index, so that one search places the pointers of all populations
+        shifts = np.arange(len(f_scaled))[:, np.newaxis]
+        cumulative = np.cumsum(f_scaled, axis=1)
+        cumulative = np.maximum.accumulate(cumulative / cumulative[:, -1:], axis=1) + shifts
+        offsets = np.array([rng.random() for rng in rngs])[:, np.newaxis]
+        pointers = (offsets + np.arange(N)) / N + shifts
+        indices = np.searchsorted(cumulative.ravel(), pointers.ravel()).reshape(pointers.shape)
+        return np.minimum(indices - shifts * N, N - 1)
+
+    def scale_batch(self, fitnesses):
+        """
+        Scale the fitnesses of all populations of a lockstep batch, see scale
+        :return: (R, N) matrix of scaled fitnesses
+        """
+        return fitnesses.copy()
+
+
+class DisruptiveSUS(SUS):
+    def scale(self, population: Population):
         f_avg = population.get_fitness_avg()
+        return np.abs(population.fitnesses - f_avg)
 
-        for index, chromosome in enumerate(population.chromosomes):
-            f_scaled = abs(chromosome.fitness - f_avg)
-            fitness_sum += f_scaled
-            if index == 0:
-                fitness_scale.append(f_scaled)
-            else:
-                fitness_scale.append(f_scaled + fitness_scale[index - 1])
-
-        if fitness_sum == 0:
-            fitness_sum = 0.0001 * N
-            fitness_scale = [0.0001 * (i+1) for i in range(N)]
-
-        mating_pool = SUS.basic_sus(population, fitness_sum, fitness_scale)
-        population.update_chromosomes(mating_pool)
+    def scale_batch(self, fitnesses):
+        return np.abs(fitnesses - np.mean(fitnesses, axis=1, keepdims=True))
 
 
-class BlendedSUS(SelectionMethod):
+class BlendedSUS(SUS):
     def __init__(self):
         self.i = 0
 
-    def select(self, population: Population):
-        fitness_sum = 0
-        fitness_scale = []
-
-        for index, chromosome in enumerate(population.chromosomes):
-            f_scaled = chromosome.fitness / (G + 1 - self.i)
-            fitness_sum += f_scaled
-            if index == 0:
-                fitness_scale.append(f_scaled)
-            else:
-                fitness_scale.append(f_scaled + fitness_scale[index - 1])
-
-        if fitness_sum == 0:
-            fitness_sum = 0.0001 * N
-            fitness_scale = [0.0001 * (i+1) for i in range(N)]
+    def select(self, population: Population, rng):
+        super().select(population, rng)
+        self.i += 1
 
-        mating_pool = SUS.basic_sus(population, fitness_sum, fitness_scale)
-        population.update_chromosomes(mating_pool)
+    def skip(self, generations):
+        self.i += generations
 
-        self.i += 1
+    def scale(self, population: Population):
+        return population.fitnesses / (G + 1 - self.i)
 
 
-class WindowSUS(SelectionMethod):
+class WindowSUS(SUS):
     def __init__(self, h=2):
         self.h = h
         self.f_h_worst = []
 
-    def select(self, population: Population):
+    def scale(self, population: Population):
         if len(self.f_h_worst) < self.h:
             self.f_h_worst.append(min(population.fitnesses))
         else:
@@ -104,56 +107,18 @@ class WindowSUS(SelectionMethod):
             self.f_h_worst[1] = min(population.fitnesses)
         f_worst = min(self.f_h_worst)
 
-        fitness_sum = 0
-        fitness_scale = []
-
-        for index, chromosome in enumerate(population.chromosomes):
-            f_scaled = chromosome.fitness - f_worst
-            fitness_sum += f_scaled
-            if index == 0:
-                fitness_scale.append(f_scaled)
-            else:
-                fitness_scale.append(f_scaled + fitness_scale[index - 1])
-
-        if fitness_sum == 0:
-            fitness_sum = 0.0001 * N
-            fitness_scale = [0.0001 * (i+1) for i in range(N)]
-
-        mating_pool = SUS.basic_sus(population, fitness_sum, fitness_scale)
-        population.update_chromosomes(mating_pool)
+        return population.fitnesses - f_worst
 
 
-class ScaledSUS(SelectionMethod):
+class ScaledSUS(SUS):
 
     def __init__(self, scale: float, bias: callable):
         self.a = scale
         self.b = bias
 
-    def select(self, population: Population):
-        fitness_sum = 0
-        fitness_scale = []
-
+    def scale(self, population: Population):
         bias = self.b(population.fitnesses)
-
-        scaled_fitnesses = np.array([self.a*chr.fitness + bias for chr in population.chromosomes])
-        
-        scaled_fitnesses = np.array([np.maximum(0, fitness) for fitness in scaled_fitnesses])
+        scaled_fitnesses = np.maximum(0, self.a*population.fitnesses + bias)
         if np.all(scaled_fitnesses == 0):
             scaled_fitnesses = 0*scaled_fitnesses + 0.0001
-
-        for index, chromosome in enumerate(population.chromosomes):
-            scaled_fitness = scaled_fitnesses[index]
-            if scaled_fitness < 0:
-                print(f"!!!\n\tScaled fitness = {scaled_fitness}\n!!!")
-            fitness_sum += scaled_fitness
-            if index == 0:
-                fitness_scale.append(scaled_fitness)
-            else:
-                fitness_scale.append(scaled_fitness + fitness_scale[index - 1])
-
-        if fitness_sum == 0:
-            fitness_sum = 0.0001 * N
-            fitness_scale = [0.0001 * (i+1) for i in range(N)]
-
-        mating_pool = SUS.basic_sus(population, fitness_sum, fitness_scale)
-        population.update_chromosomes(mating_pool)
+        return scaled_fitnesses
@@ -0,0 +1,84 @@
+import numpy as np
+
+STATE_DTYPE = np.dtype([
+    ('start', np.float64), ('fin', np.float64),
+    ('min', np.float64), ('NI_min', np.int64),
+    ('max', np.float64), ('NI_max', np.int64),
+    ('avg', np.float64)
+])
+
+
+class ColumnarAccumulator:
+    """
+    Running stats of several metrics over the generations of a run: the first and the last value,
+    the minimum and the maximum with the generations they were reached at, and the running average.
+    The state of every metric is a row of a structured array, all rows are updated at once
+    """
+    def __init__(self, names, active=None, n_runs=None):
+        """
+        :param names: names of the accumulated metrics
+        :param active: names of the metrics that are computed in the run, all of them by default.
+                       The stats of the other metrics stay empty
+        :param n_runs: number of runs accumulated together (see split), a single run if None
+        """
+        self.names = list(names)
+        self.columns = {name: column for column, name in enumerate(self.names)}
+        self.active = np.array([active is None or name in active for name in self.names])
+        shape = len(self.names) if n_runs is None else (n_runs, len(self.names))
+        self.state = np.zeros(shape, dtype=STATE_DTYPE)
+        self.is_empty = True
+
+    def update(self, values, gen_i, runs=None, generations=1):
+        """
+        :param values: vector of the values of all metrics in generation gen_i, ignored for inactive metrics.
+                       For several runs, a matrix with a row for every run in runs
+        :param runs: indices of the runs the values belong to, for an accumulator of several runs
+        :param generations: number of consecutive generations from gen_i with the same values
+        """
+        values = np.asarray(values, dtype=np.float64)[..., self.active]
+        index = self.active if runs is None else np.ix_(runs, np.flatnonzero(self.active))
+        state = self.state[index]
+
+        if self.is_empty:
+            for field in ('start', 'min', 'max', 'avg'):
+                state[field] = values
+            state['NI_min'] = gen_i
+            state['NI_max'] = gen_i
+            self.is_empty = False
+        else:
+            lower = values < state['min']
+            state['min'][lower] = values[lower]
+            state['NI_min'][lower] = gen_i
+            higher = values > state['max']
+            state['max'][higher] = values[higher]
+            state['NI_max'][higher] = gen_i
+            state['avg'] = (state['avg'] * (gen_i - 1) + values) / gen_i
+        if generations > 1:
+            # the running average of the repeated values in closed form
+            last_gen_i = gen_i + generations - 1
+            state['avg'] = (state['avg'] * gen_i + values * (generations - 1)) / last_gen_i
+        state['fin'] = values
+
+        self.state[index] = state
+
+    def split(self):
+        """
+        :return: an accumulator for every run of an accumulator of several runs
+        """
+        accumulators = []
+        for state in self.state:
+            accumulator = ColumnarAccumulator(self.names)
+            accumulator.active = self.active
+            accumulator.state = state.copy()
+            accumulator.is_empty = self.is_empty
+            accumulators.append(accumulator)
+        return accumulators
+
+    def get(self, name, field):
+        """
+        :return: the stat of the metric, None if the metric was not accumulated
+        """
+        column = self.columns[name]
+        if self.is_empty or not self.active[column]:
+            return None
+        return self.state[field][column].item()
@@ -0,0 +1,133 @@
+from config import N
+import numpy as np
+from scipy.stats import binom
+from selection.selection_method import SelectionMethod
+from selection.sus import SUS
+
+# probability mass left in the transient states below which the distributions are not iterated further
+TOLERANCE = 1e-15
+
+
+class TakeoverChain:
+    """
+    Number of optimal chromosomes of a population evolved by selection alone, as a Markov chain on 0..N.
+    The non-optimal chromosomes are taken to have one common fitness, then the share of the wheel the
+    k optimal chromosomes take only depends on k: roulette wheel selection draws the optimal count of the
+    next generation from Binomial(N, share), and SUS gives the optimal chromosomes, which lie next to each
+    other on the wheel as in a GenotypeMultiset, floor(N * share) or ceil(N * share) pointers.
+    States 0 (the optimal chromosome is lost) and N (takeover) are absorbing
+    """
+    def __init__(self, selection_method: SelectionMethod, f_optimal, f_other):
+        """
+        :param selection_method: a selection method that scales the fitnesses with scale_batch
+        :param f_optimal: fitness of the optimal chromosome
+        :param f_other: fitness of the non-optimal chromosomes
+        """
+        shares = TakeoverChain.optimal_shares(selection_method, f_optimal, f_other)
+        if isinstance(selection_method, SUS):
+            expected = N * shares
+            floors = np.minimum(np.floor(expected).astype(np.int64), N)
+            fractions = expected - floors
+            self.transitions = np.zeros((N + 1, N + 1))
+            self.transitions[np.arange(N + 1), floors] = 1 - fractions
+            self.transitions[np.arange(N + 1), np.minimum(floors + 1, N)] += fractions
+        else:
+            self.transitions = binom.pmf(np.arange(N + 1), N, shares[:, np.newaxis])
+
+    @staticmethod
+    def optimal_shares(selection_method: SelectionMethod, f_optimal, f_other):
+        """
+        :return: share of the scaled fitness taken by the optimal chromosomes for every optimal count
+        """
+        is_optimal = np.arange(N) < np.arange(N + 1)[:, np.newaxis]
+        f_scaled = selection_method.scale_batch(np.where(is_optimal, f_optimal, f_other).astype(np.float64))
+        # a population without scaled fitness is chosen from uniformly, as in choose_batch
+        f_scaled[np.sum(f_scaled, axis=1) == 0] = 0.0001
+        return np.sum(f_scaled, axis=1, where=is_optimal) / np.sum(f_scaled, axis=1)
+
+    def hitting_times(self, start, generations):
+        """
+        Distributions of the generations at which the chain is absorbed
+        :param start: distribution of the optimal count of the initial population
+        :param generations: generation limit
+        :return: (probability of the takeover at every generation, probability of the loss of the optimal
+                 chromosome at every generation, probability of the loss right after a generation with
+                 every optimal count)
+        """
+        transient = np.asarray(start, dtype=np.float64).copy()
+        takeovers = [transient[N]]
+        # a population without the optimal chromosome has not lost it
+        losses = [0.0]
+        saved = np.zeros(N + 1)
+        transient[[0, N]] = 0
+
+        for _ in range(generations):
+            if np.sum(transient) < TOLERANCE:
+                break
+            saved += transient * self.transitions[:, 0]
+            distribution = transient @ self.transitions
+            takeovers.append(distribution[N])
+            losses.append(distribution[0])
+            distribution[[0, N]] = 0
+            if np.array_equal(distribution, transient):
+                # the chain stays where it is until the generation limit
+                break
+            transient = distribution
+
+        return np.array(takeovers), np.array(losses), saved
+
+
+class LineageChain:
+    """
+    Number of ancestors of a population evolved by selection alone when all chromosomes have the same fitness,
+    as a Markov chain backwards in time. The chromosomes of a generation choose their parents uniformly
+    with roulette wheel selection, so n lineages have j distinct parents with the occupancy probabilities,
+    while SUS gives every chromosome one child and the lineages never merge.
+    The ancestors are a uniformly random subset of the initial population, so the population is homogeneous
+    when it descends from a single chromosome or from copies of the same genotype only
+    """
+    def __init__(self, selection_method: SelectionMethod):
+        if isinstance(selection_method, SUS):
+            self.transitions = np.eye(N + 1)
+            return
+
+        # n lineages choose their parents one after another
+        self.transitions = np.zeros((N + 1, N + 1))
+        self.transitions[0, 0] = 1
+        ancestors = np.arange(1, N + 1)
+        for n in range(1, N + 1):
+            previous = self.transitions[n - 1]
+            self.transitions[n, 1:] = previous[1:] * ancestors / N + previous[:-1] * (N - ancestors + 1) / N
+
+    @staticmethod
+    def homogeneous_probabilities(n_optimal):
+        """
+        :param n_optimal: number of copies of the optimal chromosome in the initial population,
+                          all other initial chromosomes are different
+        :return: probability of the population to be homogeneous given its number of ancestors
+        """
+        ancestors = np.arange(N + 1)
+        probabilities = np.cumprod(np.concatenate([[1.0], (n_optimal - ancestors[:-1]) / (N - ancestors[:-1])]))
+        probabilities[1] = 1.0
+        return np.maximum(probabilities, 0)
+
+    def homogeneity_times(self, homogeneous, generations):
+        """
+        :param homogeneous: probability of the population to be homogeneous given its number of ancestors
+        :param generations: generation limit
+        :return: probability of the population to become homogeneous at every generation
+        """
+        lineages = np.zeros(N + 1)
+        lineages[N] = 1
+        homogeneity = [lineages @ homogeneous]
+
+        for _ in range(generations):
+            if 1 - homogeneity[-1] < TOLERANCE:
+                break
+            distribution = lineages @ self.transitions
+            if np.array_equal(distribution, lineages):
+                break
+            lineages = distribution
+            homogeneity.append(lineages @ homogeneous)
+
+        return np.diff(homogeneity, prepend=0)
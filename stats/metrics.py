@@ -0,0 +1,356 @@
+from config import N, GEN_STATS_METRICS
+import numpy as np
+import math
+from functools import lru_cache
+from scipy.stats import kendalltau
+from selection.rws import ScaledRWS
+from selection.sus import ScaledSUS
+
+# Registry of the generation stats. Every metric is a function that sets the attribute of the same
+# name on a GenerationStats object, and declares the stage of the generation it is computed at,
+# the metrics it depends on and its relative cost. A run only computes the metrics it was
+# configured with (see GEN_STATS_METRICS in config.py) together with their dependencies.
+# Metrics can also have a lockstep version, which sets a vector with an entry per population
+# on a GenerationStatsBatch (see lockstep_algorithm.py).
+
+BEFORE_SELECTION = 'before_selection'
+AFTER_SELECTION = 'after_selection'
+
+
+class Metric:
+    def __init__(self, name, stage, compute, dependencies=(), cost=1, for_fconst=False):
+        """
+        :param stage: BEFORE_SELECTION or AFTER_SELECTION
+        :param compute: function (gen_stats, prev_gen_stats) that sets the metric on gen_stats
+        :param dependencies: names of the metrics that have to be computed first
+        :param cost: relative cost of the metric, cheaper metrics are computed first
+        :param for_fconst: whether the metric is computed for FconstALL, where fitness is constant
+        """
+        self.name = name
+        self.stage = stage
+        self.compute = compute
+        self.dependencies = tuple(dependencies)
+        self.cost = cost
+        self.for_fconst = for_fconst
+        # function (gen_stats_batch, prev_gen_stats_batch) that sets the metric on a GenerationStatsBatch
+        self.compute_batch = None
+
+
+METRICS: dict[str, Metric] = {}
+
+
+def metric(stage, dependencies=(), cost=1, for_fconst=False):
+    """
+    Register the decorated function as the metric with the same name
+    """
+    def register(compute):
+        METRICS[compute.__name__] = Metric(compute.__name__, stage, compute, dependencies, cost, for_fconst)
+        return compute
+    return register
+
+
+def batch_metric(name):
+    """
+    Register the decorated function as the lockstep version of a metric
+    """
+    def register(compute_batch):
+        METRICS[name].compute_batch = compute_batch
+        return compute_batch
+    return register
+
+
+def resolve(names, param_names):
+    """
+    Find the metrics to compute for an experiment
+    :param names: names of the requested metrics, all registered metrics if None
+    :param param_names: experiment parameters, the first one being the fitness function name
+    :return: list of the requested metrics and their dependencies, every metric after its dependencies
+    """
+    if names is None:
+        names = METRICS.keys()
+    is_fconst = param_names[0] == 'FconstALL'
+
+    resolved = {}
+    def visit(name):
+        if name in resolved:
+            return
+        metric = METRICS[name]
+        for dependency in metric.dependencies:
+            visit(dependency)
+        resolved[name] = metric
+
+    for name in sorted(names, key=lambda name: METRICS[name].cost):
+        visit(name)
+    return [metric for metric in resolved.values() if metric.for_fconst or not is_fconst]
+
+
+def required_names(param_names):
+    """
+    Names of the configured generation stats (see GEN_STATS_METRICS in config.py) together with
+    the ones the algorithms themselves need
+    :return: list of names, None for all metrics
+    """
+    if GEN_STATS_METRICS is None:
+        return None
+    names = list(GEN_STATS_METRICS)
+    if param_names[0] == 'FHD' or param_names[0] == 'FH':
+        # success is decided by the number of optimal chromosomes
+        names.append('optimal_count')
+    return names
+
+
+# Stats before selection
+
+@metric(BEFORE_SELECTION, cost=2, for_fconst=True)
+def n_unique_before_selection(gen_stats, prev_gen_stats):
+    gen_stats.n_unique_before_selection = gen_stats.population.get_unique_X()
+
+
+@metric(BEFORE_SELECTION)
+def f_avg(gen_stats, prev_gen_stats):
+    gen_stats.f_avg = gen_stats.population.get_fitness_avg()
+
+
+@metric(BEFORE_SELECTION)
+def f_std(gen_stats, prev_gen_stats):
+    gen_stats.f_std = gen_stats.population.get_fitness_std()
+
+
+@metric(BEFORE_SELECTION)
+def f_best(gen_stats, prev_gen_stats):
+    gen_stats.f_best = gen_stats.population.get_fitness_max()
+
+
+@metric(BEFORE_SELECTION, dependencies=('f_best',))
+def num_of_best(gen_stats, prev_gen_stats):
+    gen_stats.num_of_best = gen_stats.population.count_fitness_at_least(gen_stats.f_best)
+
+
+@metric(BEFORE_SELECTION, cost=2)
+def optimal_count(gen_stats, prev_gen_stats):
+    if prev_gen_stats is not None:
+        gen_stats.prev_optimal_count = prev_gen_stats.optimal_count
+    gen_stats.optimal_count = gen_stats.population.count_optimal_genotype()
+    if gen_stats.prev_optimal_count is not None and gen_stats.prev_optimal_count > 0 and gen_stats.optimal_count == 0:
+        gen_stats.lose_optimal = True
+
+
+@metric(BEFORE_SELECTION, dependencies=('f_best', 'f_avg'))
+def pr(gen_stats, prev_gen_stats):
+    sm = gen_stats.sm
+    if isinstance(sm, ScaledRWS) or isinstance(sm, ScaledSUS):
+        fitnesses = gen_stats.population.fitnesses
+        bias = sm.b(fitnesses)
+        scaled_fitnesses = np.maximum(sm.a*fitnesses + bias, 0).astype(np.float64)
+        if np.all(scaled_fitnesses == 0):
+            scaled_fitnesses += 0.0001
+        gen_stats.pr = np.max(scaled_fitnesses) / np.mean(scaled_fitnesses)
+    else:
+        gen_stats.pr = gen_stats.f_best / gen_stats.f_avg
+
+
+@metric(BEFORE_SELECTION, dependencies=('f_best', 'num_of_best'))
+def growth_rate(gen_stats, prev_gen_stats):
+    if not prev_gen_stats:
+        gen_stats.growth_rate = 1
+    else:
+        num_of_prev_best = gen_stats.population.count_fitness_at_least(prev_gen_stats.f_best)
+        gen_stats.growth_rate = num_of_prev_best / prev_gen_stats.num_of_best
+
+
+# Stats after selection
+
+@metric(AFTER_SELECTION, cost=2, for_fconst=True)
+def n_unique_after_selection(gen_stats, prev_gen_stats):
+    gen_stats.n_unique_after_selection = gen_stats.population.get_unique_X()
+
+
+@metric(AFTER_SELECTION, for_fconst=True)
+def offspring_counts(gen_stats, prev_gen_stats):
+    # number of copies of every chromosome of the previous generation in the mating pool
+    gen_stats.offspring_counts = np.bincount(gen_stats.population.parents, minlength=N)
+
+
+@metric(AFTER_SELECTION, dependencies=('offspring_counts',), for_fconst=True)
+def reproduction_rate(gen_stats, prev_gen_stats):
+    gen_stats.reproduction_rate = np.count_nonzero(gen_stats.offspring_counts) / N
+
+
+@metric(AFTER_SELECTION, dependencies=('offspring_counts',), for_fconst=True)
+def loss_of_diversity(gen_stats, prev_gen_stats):
+    gen_stats.loss_of_diversity = np.count_nonzero(gen_stats.offspring_counts == 0) / N
+
+
+@metric(AFTER_SELECTION, dependencies=('f_avg',))
+def difference(gen_stats, prev_gen_stats):
+    gen_stats.difference = gen_stats.population.get_fitness_avg() - gen_stats.f_avg
+
+
+@metric(AFTER_SELECTION, dependencies=('difference', 'f_std'))
+def intensity(gen_stats, prev_gen_stats):
+    if gen_stats.f_std == 0:
+        gen_stats.intensity = 1
+    else:
+        gen_stats.intensity = gen_stats.difference / gen_stats.f_std
+
+
+@metric(AFTER_SELECTION, dependencies=('offspring_counts',), cost=3)
+def P_FET(gen_stats, prev_gen_stats):
+    gen_stats.P_FET = fisher_exact_test(gen_stats.offspring_counts, gen_stats.init_fitnesses)
+
+
+@metric(AFTER_SELECTION, dependencies=('offspring_counts',), cost=5)
+def Kendall_tau(gen_stats, prev_gen_stats):
+    # it is important to check for constant because Kendall tau returns nan
+    if np.all(gen_stats.offspring_counts == 1):
+        gen_stats.Kendall_tau = 0
+    else:
+        gen_stats.Kendall_tau = kendalltau(gen_stats.init_fitnesses, gen_stats.offspring_counts).statistic
+
+
+# Lockstep versions of the metrics
+
+@batch_metric('n_unique_before_selection')
+def n_unique_before_selection_batch(gen_stats, prev_gen_stats):
+    gen_stats.n_unique_before_selection = gen_stats.population.get_unique_X()
+
+
+@batch_metric('f_avg')
+def f_avg_batch(gen_stats, prev_gen_stats):
+    gen_stats.f_avg = gen_stats.population.get_fitness_avg()
+
+
+@batch_metric('f_std')
+def f_std_batch(gen_stats, prev_gen_stats):
+    gen_stats.f_std = gen_stats.population.get_fitness_std()
+
+
+@batch_metric('f_best')
+def f_best_batch(gen_stats, prev_gen_stats):
+    gen_stats.f_best = gen_stats.population.get_fitness_max()
+
+
+@batch_metric('num_of_best')
+def num_of_best_batch(gen_stats, prev_gen_stats):
+    gen_stats.num_of_best = gen_stats.population.count_fitness_at_least(gen_stats.f_best)
+
+
+@batch_metric('optimal_count')
+def optimal_count_batch(gen_stats, prev_gen_stats):
+    gen_stats.optimal_count = gen_stats.population.count_optimal_genotype()
+    if prev_gen_stats is not None:
+        gen_stats.prev_optimal_count = prev_gen_stats.optimal_count
+        gen_stats.lose_optimal = (gen_stats.prev_optimal_count > 0) & (gen_stats.optimal_count == 0)
+
+
+@batch_metric('pr')
+def pr_batch(gen_stats, prev_gen_stats):
+    # the selection methods of the lockstep batches do not scale the fitnesses linearly
+    gen_stats.pr = gen_stats.f_best / gen_stats.f_avg
+
+
+@batch_metric('growth_rate')
+def growth_rate_batch(gen_stats, prev_gen_stats):
+    if not prev_gen_stats:
+        gen_stats.growth_rate = np.ones(len(gen_stats.population))
+    else:
+        num_of_prev_best = gen_stats.population.count_fitness_at_least(prev_gen_stats.f_best)
+        gen_stats.growth_rate = num_of_prev_best / prev_gen_stats.num_of_best
+
+
+@batch_metric('n_unique_after_selection')
+def n_unique_after_selection_batch(gen_stats, prev_gen_stats):
+    gen_stats.n_unique_after_selection = gen_stats.population.get_unique_X()
+
+
+@batch_metric('offspring_counts')
+def offspring_counts_batch(gen_stats, prev_gen_stats):
+    parents = gen_stats.population.parents
+    runs = np.arange(len(parents))[:, np.newaxis]
+    gen_stats.offspring_counts = np.bincount((runs * N + parents).ravel(), minlength=len(parents) * N).reshape(-1, N)
+
+
+@batch_metric('reproduction_rate')
+def reproduction_rate_batch(gen_stats, prev_gen_stats):
+    gen_stats.reproduction_rate = np.count_nonzero(gen_stats.offspring_counts, axis=1) / N
+
+
+@batch_metric('loss_of_diversity')
+def loss_of_diversity_batch(gen_stats, prev_gen_stats):
+    gen_stats.loss_of_diversity = np.count_nonzero(gen_stats.offspring_counts == 0, axis=1) / N
+
+
+@batch_metric('difference')
+def difference_batch(gen_stats, prev_gen_stats):
+    gen_stats.difference = gen_stats.population.get_fitness_avg() - gen_stats.f_avg
+
+
+@batch_metric('intensity')
+def intensity_batch(gen_stats, prev_gen_stats):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gen_stats.intensity = np.where(gen_stats.f_std == 0, 1, gen_stats.difference / gen_stats.f_std)
+
+
+@batch_metric('P_FET')
+def P_FET_batch(gen_stats, prev_gen_stats):
+    gen_stats.P_FET = np.array([fisher_exact_test(offspring_counts, fitnesses) for offspring_counts, fitnesses
+                                in zip(gen_stats.offspring_counts, gen_stats.init_fitnesses)])
+
+
+@batch_metric('Kendall_tau')
+def Kendall_tau_batch(gen_stats, prev_gen_stats):
+    gen_stats.Kendall_tau = np.array([
+        0 if np.all(offspring_counts == 1) else kendalltau(fitnesses, offspring_counts).statistic
+        for offspring_counts, fitnesses in zip(gen_stats.offspring_counts, gen_stats.init_fitnesses)
+    ])
+
+
+def fisher_exact_test(offspring_counts, fitnesses):
+    """
+    Compute FET for a given selection
+    :param offspring_counts: a list of offspring counts for each chromosome id
+    :param fitnesses: a list of chromosome fitnesses
+    """
+    offspring_counts = np.array(offspring_counts)
+    fitnesses = np.array(fitnesses)
+
+    offspring_median = np.median(offspring_counts)
+    fitness_median = np.median(fitnesses)
+
+    # contingency table [[A, B], [C, D]]: rows split by offspring count, columns by fitness
+    high_offspring = (offspring_counts > offspring_median).astype(np.int64)
+    high_fitness = (fitnesses > fitness_median).astype(np.int64)
+    A, B, C, D = np.bincount(high_offspring * 2 + high_fitness, minlength=4)
+
+    return fisher_exact_log_p_values(int(A + B), int(C + D), int(A + C))[A]
+
+
+@lru_cache(maxsize=None)
+def fisher_exact_log_p_values(row_1, row_2, column_1):
+    """
+    One-sided ('greater') Fisher exact test for all 2x2 tables with the given margins.
+    The p-value of a table with top-left cell a is the hypergeometric tail P(X >= a),
+    computed exactly with integer binomial coefficients
+    :return: vector of -log10(p-value) indexed by a
+    """
+    top_left = np.arange(min(row_1, column_1) + 1)
+    counts = [math.comb(row_1, a) * math.comb(row_2, column_1 - a) for a in top_left]
+    total = math.comb(row_1 + row_2, column_1)
+
+    log_p_values = np.empty(len(counts))
+    tail = 0
+    for a in reversed(top_left):
+        tail += counts[a]
+        log_p_values[a] = math.log10(total) - math.log10(tail)
+    return log_p_values
+
+
+if __name__ == '__main__':
+    offspring_counts = [0, 0, 1, 0, 2, 1, 0, 2, 2, 2]
+    fitnesses = [0, 1, 1, 2, 3, 4, 5, 5, 7, 9]
+
+    print(f'Traits = {fitnesses}')
+    print(f'Offspring = {offspring_counts}')
+    print(f'Fisher exact test = {round(fisher_exact_test(offspring_counts, fitnesses),2)}')
+    print(f'Kendall tau-b = {round(kendalltau(np.array(fitnesses), np.array(offspring_counts)).statistic,2)}')
+    print(f'Metrics in order of computation: {[metric.name for metric in resolve(None, ("Fx2",))]}')
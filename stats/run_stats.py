@@ -1,9 +1,61 @@
-from config import N, G
-from stats.generation_stats import GenerationStats
+import numpy as np
+from config import N, G, GEN_STATS_NAMES, FCONSTALL_GEN_STATS_NAMES
+from stats.generation_stats import GenerationStats, GenerationStatsBatch
+from stats.accumulator import ColumnarAccumulator
+
+def check_success(param_names, population, has_converged, optimal_count):
+    """
+    Decide whether runs are successful from their final populations. For a PopulationBatch
+    the arguments and the result are vectors with an entry per population
+    :param population: Population, GenotypeMultiset or PopulationBatch
+    :param has_converged: whether the runs have converged
+    :param optimal_count: number of optimal chromosomes of the final populations, used for FH and FHD
+    """
+    if param_names[0] == 'FconstALL':
+        if param_names[2] == 'no_operators':
+            return population.is_homogenous_100()
+        return has_converged & population.is_homogeneous_frac(90)
+    if param_names[0] == 'FHD' or param_names[0] == 'FH':
+        if param_names[2] == 'no_operators':
+            return has_converged & (optimal_count == N)
+        return has_converged & (optimal_count >= N * 0.9)
+    else:
+        return has_converged & population.found_close_to_optimal()
+
+
+# generation stats accumulated over the run (start, fin, min, max and avg),
+# by the prefix of the run stats names
+ACCUMULATED_STATS = {
+    'RR': 'reproduction_rate',      # Reproduction Rate
+    'Teta': 'loss_of_diversity',    # Loss of Diversity
+    'I': 'intensity',               # Selection Intensity
+    's': 'difference',              # Selection Difference
+    'Pr': 'pr',                     # Selection Pressure
+    'Fish': 'P_FET',                # Fisher's Exact Test for Selection Pressure
+    'Kend': 'Kendall_tau',          # Kendall's Tau-b Test for Selection Pressure
+}
+ACCUMULATED_STATS_NAMES = {}
+for prefix, gen_stat in ACCUMULATED_STATS.items():
+    for field in ('start', 'fin', 'min', 'max', 'avg'):
+        ACCUMULATED_STATS_NAMES[f'{prefix}_{field}'] = (gen_stat, field)
+    ACCUMULATED_STATS_NAMES[f'NI_{prefix}_min'] = (gen_stat, 'NI_min')
+    ACCUMULATED_STATS_NAMES[f'NI_{prefix}_max'] = (gen_stat, 'NI_max')
+
 
 class RunStats:
-    def __init__(self, param_names: tuple[str]):
+    """
+    Stats of a single run. The stats of ACCUMULATED_STATS (RR_min, NI_Teta_max, Pr_avg, ...)
+    are read from a columnar accumulator, the other ones are plain attributes
+    """
+    def __init__(self, param_names: tuple[str], metric_names=None):
+        """
+        :param metric_names: names of the generation stats computed in every generation of the run,
+                             the stats of the other metrics are left empty
+        """
         self.param_names = param_names
+        self.metric_names = set(GEN_STATS_NAMES if metric_names is None else metric_names)
+        if param_names[0] == 'FconstALL':
+            self.metric_names &= set(FCONSTALL_GEN_STATS_NAMES)
 
         self.NI = None
         self.F_found = None
@@ -17,44 +69,14 @@ class RunStats:
         self.optSaved_NI_lose = None
         self.MaxOptSaved_NI_lose = None
 
-        # Reproduction Rate
-        self.RR_start = None
-        self.RR_fin = None
-        self.RR_min = None
-        self.NI_RR_min = None
-        self.RR_max = None
-        self.NI_RR_max = None
-        self.RR_avg = None
-
-        # Loss of Diversity
-        self.Teta_start = None
-        self.Teta_fin = None
-        self.Teta_min = None
-        self.NI_Teta_min = None
-        self.Teta_max = None
-        self.NI_Teta_max = None
-        self.Teta_avg = None
+        # Reproduction Rate, Loss of Diversity, Selection Intensity, Selection Difference,
+        # Selection Pressure, Fisher's Exact Test and Kendall's Tau-b Test
+        self.accumulator = ColumnarAccumulator(ACCUMULATED_STATS.values(), self.metric_names)
 
         # Unique chromosomes
         self.unique_X_start = None
         self.unique_X_fin = None
 
-        # Selection Intensity
-        self.I_start = None
-        self.I_min = None
-        self.NI_I_min = None
-        self.I_max = None
-        self.NI_I_max = None
-        self.I_avg = None
-
-        # Selection Difference
-        self.s_start = None
-        self.s_min = None
-        self.NI_s_min = None
-        self.s_max = None
-        self.NI_s_max = None
-        self.s_avg = None
-
         # Growth Rate
         self.GR_start = None
         self.GR_early = None
@@ -62,171 +84,159 @@ class RunStats:
         self.NI_GR_late = None
         self.GR_avg = None
 
-        # Selection Pressure
-        self.Pr_start = None
-        self.Pr_min = None
-        self.NI_Pr_min = None
-        self.Pr_max = None
-        self.NI_Pr_max = None
-        self.Pr_avg = None
-
-        # Fisher's Exact Test for Selection Pressure
-        self.Fish_start = None
-        self.Fish_min = None
-        self.NI_Fish_min = None
-        self.Fish_max = None
-        self.NI_Fish_max = None
-        self.Fish_avg = None
-
-        # Kendall's Tau-b Test for Selection Pressure
-        self.Kend_start = None
-        self.Kend_min = None
-        self.NI_Kend_min = None
-        self.Kend_max = None
-        self.NI_Kend_max = None
-        self.Kend_avg = None
-
-    def update_stats_for_generation(self, gen_stats: GenerationStats, gen_i):
-        # Reproduction Rate
-        if self.RR_start is None:
-            self.RR_start = gen_stats.reproduction_rate
-        self.RR_fin = gen_stats.reproduction_rate
-        if self.RR_min is None or gen_stats.reproduction_rate < self.RR_min:
-            self.RR_min = gen_stats.reproduction_rate
-            self.NI_RR_min = gen_i
-        if self.RR_max is None or gen_stats.reproduction_rate > self.RR_max:
-            self.RR_max = gen_stats.reproduction_rate
-            self.NI_RR_max = gen_i
-        if self.RR_avg is None:
-            self.RR_avg = gen_stats.reproduction_rate
-        else:
-            self.RR_avg = (self.RR_avg * (gen_i - 1) + gen_stats.reproduction_rate) / gen_i
-
-        # Loss of Diversity
-        if self.Teta_start is None:
-            self.Teta_start = gen_stats.loss_of_diversity
-        self.Teta_fin = gen_stats.loss_of_diversity
-        if self.Teta_min is None or gen_stats.loss_of_diversity < self.Teta_min:
-            self.Teta_min = gen_stats.loss_of_diversity
-            self.NI_Teta_min = gen_i
-        if self.Teta_max is None or gen_stats.loss_of_diversity > self.Teta_max:
-            self.Teta_max = gen_stats.loss_of_diversity
-            self.NI_Teta_max = gen_i
-        if self.Teta_avg is None:
-            self.Teta_avg = gen_stats.loss_of_diversity
-        else:
-            self.Teta_avg = (self.Teta_avg * (gen_i - 1) + gen_stats.loss_of_diversity) / gen_i
-        
+    def __getattr__(self, name):
+        # only called for the names that are not plain attributes
+        if name in ACCUMULATED_STATS_NAMES and 'accumulator' in self.__dict__:
+            return self.accumulator.get(*ACCUMULATED_STATS_NAMES[name])
+        raise AttributeError(name)
+
+    def update_stats_for_generation(self, gen_stats: GenerationStats, gen_i, generations=1):
+        """
+        :param generations: number of consecutive generations from gen_i with the same stats,
+                            e.g. generations in which the population does not change
+        """
+        self.accumulator.update([getattr(gen_stats, gen_stat) if gen_stat in self.metric_names else 0
+                                 for gen_stat in self.accumulator.names], gen_i, generations=generations)
+
         # Unique chromosomes
-        if self.unique_X_start is None:
+        if self.unique_X_start is None and 'n_unique_before_selection' in self.metric_names:
             self.unique_X_start = gen_stats.n_unique_before_selection
-        self.unique_X_fin = gen_stats.n_unique_after_selection
+        if 'n_unique_after_selection' in self.metric_names:
+            self.unique_X_fin = gen_stats.n_unique_after_selection
 
         if self.param_names[0] != 'FconstALL':
             # Loss of Optimal Chromosome
-            if gen_stats.lose_optimal:
-                self.NI_lose = gen_i
-                self.Num_lose += 1
-                self.optSaved_NI_lose = gen_stats.prev_optimal_count
-                if self.MaxOptSaved_NI_lose is None:
-                    self.MaxOptSaved_NI_lose = self.optSaved_NI_lose
-                else:
-                    self.MaxOptSaved_NI_lose = max(self.MaxOptSaved_NI_lose, self.optSaved_NI_lose)
-
-            # Selection Intensity
-            if self.I_start is None:
-                self.I_start = gen_stats.intensity
-            if self.I_min is None or gen_stats.intensity < self.I_min:
-                self.I_min = gen_stats.intensity
-                self.NI_I_min = gen_i
-            if self.I_max is None or gen_stats.intensity > self.I_max:
-                self.I_max = gen_stats.intensity
-                self.NI_I_max = gen_i
-            if self.I_avg is None:
-                self.I_avg = gen_stats.intensity
-            else:
-                self.I_avg = (self.I_avg * (gen_i - 1) + gen_stats.intensity) / gen_i
-
-            # Selection Difference
-            if self.s_start is None:
-                self.s_start = gen_stats.difference
-            if self.s_min is None or gen_stats.difference < self.s_min:
-                self.s_min = gen_stats.difference
-                self.NI_s_min = gen_i
-            if self.s_max is None or gen_stats.difference > self.s_max:
-                self.s_max = gen_stats.difference
-                self.NI_s_max = gen_i
-            if self.s_avg is None:
-                self.s_avg = gen_stats.difference
-            else:
-                self.s_avg = (self.s_avg * (gen_i - 1) + gen_stats.difference) / gen_i
+            if 'optimal_count' in self.metric_names:
+                if gen_stats.lose_optimal:
+                    self.NI_lose = gen_i
+                    self.Num_lose += 1
+                    self.optSaved_NI_lose = gen_stats.prev_optimal_count
+                    if self.MaxOptSaved_NI_lose is None:
+                        self.MaxOptSaved_NI_lose = self.optSaved_NI_lose
+                    else:
+                        self.MaxOptSaved_NI_lose = max(self.MaxOptSaved_NI_lose, self.optSaved_NI_lose)
 
             # Growth Rate
-            if gen_i == 1:
-                self.GR_start = gen_stats.growth_rate
-            if gen_i == 2:
-                self.GR_early = gen_stats.growth_rate
-            if self.GR_late is None and gen_stats.num_of_best >= N / 2:
-                self.GR_late = gen_stats.growth_rate
-                self.NI_GR_late = gen_i
-            if self.GR_avg is None:
-                self.GR_avg = gen_stats.growth_rate
-            else:
-                self.GR_avg = (self.GR_avg * (gen_i - 1) + gen_stats.growth_rate) / gen_i
-            
-            # Selection Pressure
-            if self.Pr_start is None:
-                self.Pr_start = gen_stats.pr
-            if self.Pr_min is None or self.Pr_min > gen_stats.pr:
-                self.Pr_min = gen_stats.pr
-                self.NI_Pr_min = gen_i
-            if self.Pr_max is None or self.Pr_max < gen_stats.pr:
-                self.Pr_max = gen_stats.pr
-                self.NI_Pr_max = gen_i
-            if self.Pr_avg is None:
-                self.Pr_avg = gen_stats.pr
-            else:
-                self.Pr_avg = (self.Pr_avg * (gen_i - 1) + gen_stats.pr) / gen_i
-            
-            # Fisher's Exact Test for Selection Pressure
-            if self.Fish_start is None:
-                self.Fish_start = gen_stats.P_FET
-            if self.Fish_min is None or self.Fish_min > gen_stats.P_FET:
-                self.Fish_min = gen_stats.P_FET
-                self.NI_Fish_min = gen_i
-            if self.Fish_max is None or self.Fish_max < gen_stats.P_FET:
-                self.Fish_max = gen_stats.P_FET
-                self.NI_Fish_max = gen_i
-            if self.Fish_avg is None:
-                self.Fish_avg = gen_stats.P_FET
-            else:
-                self.Fish_avg = (self.Fish_avg * (gen_i - 1) + gen_stats.P_FET) / gen_i
-            
-            # Kendall's Tau-b Test for Selection Pressure
-            if self.Kend_start is None:
-                self.Kend_start = gen_stats.Kendall_tau
-            if self.Kend_min is None or self.Kend_min > gen_stats.Kendall_tau:
-                self.Kend_min = gen_stats.Kendall_tau
-                self.NI_Kend_min = gen_i
-            if self.Kend_max is None or self.Kend_max < gen_stats.Kendall_tau:
-                self.Kend_max = gen_stats.Kendall_tau
-                self.NI_Kend_max = gen_i
-            if self.Kend_avg is None:
-                self.Kend_avg = gen_stats.Kendall_tau
-            else:
-                self.Kend_avg = (self.Kend_avg * (gen_i - 1) + gen_stats.Kendall_tau) / gen_i
+            if 'growth_rate' in self.metric_names:
+                if gen_i <= 1 < gen_i + generations:
+                    self.GR_start = gen_stats.growth_rate
+                self.__update_growth_rate(gen_stats, gen_i, generations)
 
     def update_final_stats(self, gen_stats: GenerationStats, gen_i):
         if self.param_names[0] != 'FconstALL':
             self.F_found = gen_stats.f_best
             self.F_avg = gen_stats.f_avg
 
-            if gen_i == 2:
-                self.GR_early = gen_stats.growth_rate
-            if self.GR_late is None and gen_stats.num_of_best >= N / 2:
-                self.GR_late = gen_stats.growth_rate
-                self.NI_GR_late = gen_i
-            if self.GR_avg is None:
-                self.GR_avg = gen_stats.growth_rate
-            else:
-                self.GR_avg = (self.GR_avg * (gen_i - 1) + gen_stats.growth_rate) / gen_i
+            if 'growth_rate' in self.metric_names:
+                self.__update_growth_rate(gen_stats, gen_i)
+
+    def __update_growth_rate(self, gen_stats: GenerationStats, gen_i, generations=1):
+        if gen_i <= 2 < gen_i + generations:
+            self.GR_early = gen_stats.growth_rate
+        if self.GR_late is None and gen_stats.num_of_best >= N / 2:
+            self.GR_late = gen_stats.growth_rate
+            self.NI_GR_late = gen_i
+        if self.GR_avg is None:
+            self.GR_avg = gen_stats.growth_rate
+        else:
+            self.GR_avg = (self.GR_avg * (gen_i - 1) + gen_stats.growth_rate) / gen_i
+        if generations > 1:
+            last_gen_i = gen_i + generations - 1
+            self.GR_avg = (self.GR_avg * gen_i + gen_stats.growth_rate * (generations - 1)) / last_gen_i
+
+
+class RunStatsBatch:
+    """
+    Stats of the runs of a lockstep batch, updated for all runs at once and split into a RunStats
+    for every run at the end. Every stat is a vector with an entry per run, NaN while it is not set
+    """
+    INT_STATS = ['NI', 'NI_lose', 'Num_lose', 'optSaved_NI_lose', 'MaxOptSaved_NI_lose',
+                 'unique_X_start', 'unique_X_fin', 'NI_GR_late']
+    FLOAT_STATS = ['F_found', 'F_avg', 'GR_start', 'GR_early', 'GR_late', 'GR_avg']
+
+    def __init__(self, param_names: tuple[str], metric_names, n_runs):
+        self.param_names = param_names
+        run_stats = RunStats(param_names, metric_names)
+        self.metric_names = run_stats.metric_names
+        for name in RunStatsBatch.INT_STATS + RunStatsBatch.FLOAT_STATS:
+            value = getattr(run_stats, name)
+            setattr(self, name, np.full(n_runs, np.nan if value is None else value, dtype=np.float64))
+        self.is_successful = np.zeros(n_runs, dtype=bool)
+        self.has_converged = np.zeros(n_runs, dtype=bool)
+        self.accumulator = ColumnarAccumulator(ACCUMULATED_STATS.values(), self.metric_names, n_runs)
+
+    def update_stats_for_generation(self, gen_stats: GenerationStatsBatch, gen_i, runs, generations=1):
+        """
+        :param runs: indices of the runs of the populations of gen_stats
+        :param generations: number of consecutive generations from gen_i with the same stats
+        """
+        self.accumulator.update(np.column_stack([
+            getattr(gen_stats, gen_stat) if gen_stat in self.metric_names else np.zeros(len(runs))
+            for gen_stat in self.accumulator.names
+        ]), gen_i, runs, generations)
+
+        # Unique chromosomes
+        if 'n_unique_before_selection' in self.metric_names:
+            first = np.isnan(self.unique_X_start[runs])
+            self.unique_X_start[runs[first]] = gen_stats.n_unique_before_selection[first]
+        if 'n_unique_after_selection' in self.metric_names:
+            self.unique_X_fin[runs] = gen_stats.n_unique_after_selection
+
+        if self.param_names[0] != 'FconstALL':
+            # Loss of Optimal Chromosome
+            if 'optimal_count' in self.metric_names:
+                lose = gen_stats.lose_optimal
+                self.NI_lose[runs[lose]] = gen_i
+                self.Num_lose[runs[lose]] += 1
+                if np.any(lose):
+                    self.optSaved_NI_lose[runs[lose]] = gen_stats.prev_optimal_count[lose]
+                    self.MaxOptSaved_NI_lose[runs[lose]] = np.fmax(self.MaxOptSaved_NI_lose[runs[lose]],
+                                                                   gen_stats.prev_optimal_count[lose])
+
+            # Growth Rate
+            if 'growth_rate' in self.metric_names:
+                if gen_i <= 1 < gen_i + generations:
+                    self.GR_start[runs] = gen_stats.growth_rate
+                self.__update_growth_rate(gen_stats, gen_i, runs, generations)
+
+    def update_final_stats(self, gen_stats: GenerationStatsBatch, gen_i, runs):
+        if self.param_names[0] != 'FconstALL':
+            if gen_stats.f_best is not None:
+                self.F_found[runs] = gen_stats.f_best
+            if gen_stats.f_avg is not None:
+                self.F_avg[runs] = gen_stats.f_avg
+
+            if 'growth_rate' in self.metric_names:
+                self.__update_growth_rate(gen_stats, gen_i, runs)
+
+    def __update_growth_rate(self, gen_stats: GenerationStatsBatch, gen_i, runs, generations=1):
+        if gen_i <= 2 < gen_i + generations:
+            self.GR_early[runs] = gen_stats.growth_rate
+        late = np.isnan(self.GR_late[runs]) & (gen_stats.num_of_best >= N / 2)
+        self.GR_late[runs[late]] = gen_stats.growth_rate[late]
+        self.NI_GR_late[runs[late]] = gen_i
+        first = np.isnan(self.GR_avg[runs])
+        self.GR_avg[runs] = np.where(first, gen_stats.growth_rate,
+                                     (self.GR_avg[runs] * (gen_i - 1) + gen_stats.growth_rate) / gen_i)
+        if generations > 1:
+            last_gen_i = gen_i + generations - 1
+            self.GR_avg[runs] = (self.GR_avg[runs] * gen_i + gen_stats.growth_rate * (generations - 1)) / last_gen_i
+
+    def split(self):
+        """
+        :return: RunStats of every run
+        """
+        runs_stats = []
+        for run, accumulator in enumerate(self.accumulator.split()):
+            run_stats = RunStats(self.param_names, self.metric_names)
+            run_stats.accumulator = accumulator
+            for name in RunStatsBatch.INT_STATS:
+                value = getattr(self, name)[run]
+                setattr(run_stats, name, None if np.isnan(value) else int(value))
+            for name in RunStatsBatch.FLOAT_STATS:
+                value = getattr(self, name)[run]
+                setattr(run_stats, name, None if np.isnan(value) else value)
+            run_stats.is_successful = bool(self.is_successful[run])
+            run_stats.has_converged = bool(self.has_converged[run])
+            runs_stats.append(run_stats)
+        return runs_stats